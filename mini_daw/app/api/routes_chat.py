@@ -9,25 +9,35 @@ routes_chat.py
 
 from __future__ import annotations
 
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 from pathlib import Path
 
 from app.config import CONFIG
-from app.core.state import ProjectState, new_id
+from app.core.state import new_id
 from app.core.plan_schema import ChatRequest, ChatResponse
 from app.core.executor import PlanExecutor
 
 from app.services.context_store import get_ctx
-from app.services.llm_service import GemmaPlanner
+from app.services import project_cache
+from app.services.llm_service import get_planner
 from app.services.nl_rule_parser import parse_rule_command
 from app.core.command_executor import apply_command
 from app.utils.command_logger import log_command_source
+from app.utils.state_response import state_json_response
 
-from app.services.stable_audio_service import StableAudioOpenService, StableAudioGenParams
+from app.services.stable_audio_service import StableAudioGenParams, generate_batched, write_wav
 
 
 router = APIRouter(prefix="/api/projects", tags=["chat"])
 
+def _generate_sample_to_wav(params: StableAudioGenParams, out: Path) -> None:
+    # Stable Audio 파이프라인은 프로세스 공용(잡과 공유). GPU 락(SA_LOCK)과 동시 요청 묶기는 generate_batched 안에서만,
+    # 여기의 wav 저장은 락이 풀린 뒤라 다음 생성이 디스크 쓰기를 기다리지 않음
+    audio, sr = generate_batched(params)
+    write_wav(out, audio, sr)
+
 
 def project_path(project_id: str) -> Path:
     return CONFIG.storage_dir / "projects" / f"{project_id}.json"
@@ -55,20 +65,24 @@ def _try_parse_chat_generate_sample(msg: str):
     return None
 
 
-@router.post("/{project_id}/chat", response_model=ChatResponse)
-def chat(project_id: str, req: ChatRequest):
+# 응답은 state_json_response로 직접 인코딩(검증 생략). ChatResponse는 OpenAPI 문서용으로만 사용
+@router.post("/{project_id}/chat", responses={200: {"model": ChatResponse}})
+async def chat(project_id: str, req: ChatRequest):
     path = project_path(project_id)
-    if not path.exists():
+    state = await project_cache.get_or_none(path)
+    if state is None:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    state = ProjectState.load(path)
     ctx = get_ctx(project_id)
 
     # 1) 룰 기반 먼저
     cmd = parse_rule_command(req.message)
     if cmd:
-        apply_command(state, cmd)
-        state.save(path)
+        async with project_cache.lock(project_id):
+            state = await project_cache.get(path)
+            with project_cache.discard_on_error(path):
+                apply_command(state, cmd)
+                await project_cache.save(path, state)
 
         log_command_source(
             project_id=project_id,
@@ -77,8 +91,8 @@ def chat(project_id: str, req: ChatRequest):
             detail=cmd.type,
         )
 
-        return ChatResponse(
-            state=state.to_dict(),
+        return state_json_response(
+            state,
             plan={"summary": "rule-based command", "actions": [], "assumptions": []},
             messages=[f"Applied command: {cmd.type}"],
         )
@@ -94,25 +108,27 @@ def chat(project_id: str, req: ChatRequest):
         out.parent.mkdir(parents=True, exist_ok=True)
 
         # Stable Audio Open 생성
-        service = StableAudioOpenService()
         params = StableAudioGenParams(
             prompt=prompt,
             seconds=seconds,
             seed=None,
-            num_inference_steps=40,
-            guidance_scale=7.0,
         )
-        service.generate_to_wav(params, out)
+        # 생성은 수 초 걸리는 GPU 작업이라 이벤트 루프 밖(스레드)에서 실행
+        # (락 밖에서 생성 → 그동안 같은 프로젝트의 다른 편집을 막지 않음)
+        await asyncio.to_thread(_generate_sample_to_wav, params, out)
 
         # samples 등록
-        state.samples[sample_id] = {
-            "kind": "melodic",
-            "instrument": "custom",
-            "base_pitch": "A1",
-            "prompt": prompt,
-            "path": f"/files/samples/{project_id}/{sample_id}.wav",
-        }
-        state.save(path)
+        async with project_cache.lock(project_id):
+            state = await project_cache.get(path)
+            with project_cache.discard_on_error(path):
+                state.samples[sample_id] = {
+                    "kind": "melodic",
+                    "instrument": "custom",
+                    "base_pitch": "A1",
+                    "prompt": prompt,
+                    "path": f"/files/samples/{project_id}/{sample_id}.wav",
+                }
+                await project_cache.save(path, state)
 
         log_command_source(
             project_id=project_id,
@@ -121,27 +137,28 @@ def chat(project_id: str, req: ChatRequest):
             detail="chat-generate-sample",
         )
 
-        return ChatResponse(
-            state=state.to_dict(),
+        return state_json_response(
+            state,
             plan={"summary": "chat-generate-sample", "actions": [], "assumptions": []},
             messages=[f"Generated sample added: {sample_id}"],
         )
 
     # 3) LLM 기반 Plan
-    planner = GemmaPlanner(model_name="google/gemma-2-2b-it")
+    planner = get_planner()
 
-    state_hint = {
-        "bpm": state.meta.bpm,
-        "bars": state.meta.bars,
-        "ticks_per_bar": state.meta.ticks_per_bar,
-        "ticks_per_beat": state.meta.ticks_per_beat,
-        "total_ticks": state.meta.total_ticks,
-    }
+    state_hint = state.meta.as_hint
 
-    plan = planner.make_plan(req.message, state_hint=state_hint)
+    # Plan 생성(LLM)은 락 밖에서 → 실행/저장만 프로젝트 락 안에서
+    # (LLM 실행 직렬화는 GemmaPlanner 안에서)
+    plan = await asyncio.to_thread(planner.make_plan, req.message, state_hint)
 
-    executor = PlanExecutor()
-    messages = executor.execute(state, ctx, plan)
+    async with project_cache.lock(project_id):
+        state = await project_cache.get(path)
+        executor = PlanExecutor()
+        # LLM이 만든 args가 잘못되면 중간까지 바뀐 state가 캐시에 남지 않도록 버림
+        with project_cache.discard_on_error(path):
+            messages = executor.execute(state, ctx, plan)
+            await project_cache.save(path, state)
 
     log_command_source(
         project_id=project_id,
@@ -150,9 +167,8 @@ def chat(project_id: str, req: ChatRequest):
         detail=plan.summary,
     )
 
-    state.save(path)
-    return ChatResponse(
-        state=state.to_dict(),
+    return state_json_response(
+        state,
         plan=plan.model_dump(),
         messages=messages,
     )
@@ -2,31 +2,45 @@
 routes_jobs.py
 
 렌더/샘플 생성 같은 "무거운 작업"을 job으로 실행하는 API.
-Step4에서는 진행률을 폴링(GET /api/jobs/{job_id})로 확인합니다.
+진행률은 SSE(GET /api/jobs/{job_id}/events)로 push 받거나,
+폴링(GET /api/jobs/{job_id})으로 확인합니다.
 """
 
 from __future__ import annotations
 
+import asyncio
+
+import orjson
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from pathlib import Path
+from threading import Lock
+from typing import Optional
 import time
 
+import os
 import shutil
 import random
-from app.services.stable_audio_service import StableAudioOpenService, StableAudioGenParams
+from app.services.stable_audio_service import StableAudioGenParams, generate_batched, write_wav
 
 from app.config import CONFIG
-from app.core.state import ProjectState, new_id
+from app.core.state import new_id
 from app.services.job_queue import JOBS
 from app.core.audio.render_stub import write_silence_wav
 
-from app.core.audio.mixer import render_mix_to_wav, RenderRegion
+from app.core.audio.mixer import render_project_file, RenderRegion
+from app.services import project_cache, render_pool
 
 
 
 router = APIRouter(tags=["jobs"])
 
+# job 진행률 SSE 하트비트 간격(초)
+SSE_HEARTBEAT_SEC = 20.0
+# job 스레드가 이벤트 루프에 맡긴 샘플 등록(프로젝트 저장)을 기다리는 최대 시간(초)
+REGISTER_TIMEOUT_SEC = 30.0
+
 
 def project_path(project_id: str) -> Path:
     return CONFIG.storage_dir / "projects" / f"{project_id}.json"
@@ -41,6 +55,54 @@ def sample_path(project_id: str, sample_id: str) -> Path:
     return CONFIG.storage_dir / "samples" / project_id / f"{sample_id}.wav"
 
 
+# 프리셋 wav 목록 캐시: (폴더, 폴더 mtime_ns, wav 목록)
+_PRESET_CACHE: Optional[tuple[Path, int, list[Path]]] = None
+_PRESET_LOCK = Lock()
+
+
+def _get_presets(preset_dir: Path) -> list[Path]:
+    """
+    프리셋 폴더의 wav 목록. 폴더 mtime이 그대로면 이전 스캔 결과를 재사용합니다.
+    (파일 추가/삭제 시 폴더 mtime이 바뀌므로 다시 스캔)
+    """
+    global _PRESET_CACHE
+    mtime = preset_dir.stat().st_mtime_ns
+    with _PRESET_LOCK:
+        hit = _PRESET_CACHE
+        if hit is not None and hit[0] == preset_dir and hit[1] == mtime:
+            return hit[2]
+        with os.scandir(preset_dir) as it:
+            wavs = [Path(e.path) for e in it if e.name.endswith(".wav") and e.is_file()]
+        _PRESET_CACHE = (preset_dir, mtime, wavs)
+        return wavs
+
+
+# 프리셋 wav 복사 단위(1MiB)
+_COPY_CHUNK = 1 << 20
+
+
+def _copy_file(src: Path, dst: Path) -> None:
+    """
+    파일 복사. 가능하면 os.sendfile(커널 내부 복사), 아니면 1MiB 버퍼로 복사.
+    (shutil.copyfile의 8KiB/64KiB 기본 버퍼보다 syscall 수가 적음)
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        if hasattr(os, "sendfile"):
+            try:
+                offset = 0
+                while True:
+                    sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, _COPY_CHUNK)
+                    if sent == 0:
+                        return
+                    offset += sent
+            except OSError:
+                # sendfile 미지원 파일시스템 등 → 처음부터 일반 복사
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, length=_COPY_CHUNK)
+
+
 class JobResponse(BaseModel):
     job_id: str
 
@@ -68,31 +130,69 @@ def get_job(job_id: str):
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    return {
-        "id": job.id,
-        "type": job.type,
-        "status": job.status,
-        "progress": job.progress,
-        "message": job.message,
-        "result": job.result,
-        "error": job.error,
-    }
+    return job.to_dict()
 
-@router.post("/api/projects/{project_id}/jobs/render_preview", response_model=JobResponse)
-def create_render_preview(project_id: str, req: RenderRequest):
+
+@router.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Job 진행률 스트림(SSE, text/event-stream).
+    상태가 바뀔 때마다 `data: {job json}` 이벤트를 보내고, done/failed가 되면 종료합니다.
+    변경이 없는 동안은 SSE_HEARTBEAT_SEC마다 `: ping` 주석을 보냅니다.
+    """
+    q = JOBS.subscribe(job_id)
+    if q is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def _stream():
+        try:
+            # 구독 후 현재 상태를 먼저 한 번 보냄(그 사이 놓친 변경 없음)
+            snap = JOBS.get(job_id).to_dict()
+            while True:
+                yield b"data: " + orjson.dumps(snap) + b"\n\n"
+                if snap["status"] in ("done", "failed"):
+                    return
+                # 샘플 생성처럼 한 단계가 오래 걸려도 프록시가 연결을 끊지 않도록 주기적으로 주석 이벤트 전송
+                while True:
+                    try:
+                        snap = await asyncio.wait_for(q.get(), timeout=SSE_HEARTBEAT_SEC)
+                        break
+                    except asyncio.TimeoutError:
+                        yield b": ping\n\n"
+        finally:
+            JOBS.unsubscribe(job_id, q)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _flushed_project_path(project_id: str) -> Path:
+    """
+    렌더 워커는 프로젝트 파일을 직접 읽으므로, 미뤄둔 저장(set_start 디바운스)을 먼저 디스크에 쓰고 경로 반환.
+    프로젝트가 없으면 404.
+    """
     path = project_path(project_id)
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="Project not found")
+    async with project_cache.lock(project_id):
+        if await project_cache.get_or_none(path) is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        await project_cache.flush(path)
+    return path
 
-    def _task(job_id: str) -> dict:
-        JOBS.update(job_id, progress=5, message="loading project")
-        state = ProjectState.load(path)
 
+@router.post("/api/projects/{project_id}/jobs/render_preview", response_model=JobResponse)
+async def create_render_preview(project_id: str, req: RenderRequest):
+    path = await _flushed_project_path(project_id)
+
+    def _task(job_id: str) -> dict:
         JOBS.update(job_id, progress=35, message="mixing preview")
         out = render_path(project_id, "preview")
 
-        render_mix_to_wav(
-            state,
+        # 렌더 본체(프로젝트 로드 포함)는 워커 프로세스에서 실행
+        render_pool.run(
+            render_project_file,
+            path,
             out_wav=out,
             storage_dir=CONFIG.storage_dir,
             preset_dir=getattr(CONFIG, "preset_samples_dir", None),
@@ -107,21 +207,17 @@ def create_render_preview(project_id: str, req: RenderRequest):
     return JobResponse(job_id=job_id)
 
 @router.post("/api/projects/{project_id}/jobs/render_mixdown", response_model=JobResponse)
-def create_render_mixdown(project_id: str, req: RenderRequest):
-    path = project_path(project_id)
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="Project not found")
+async def create_render_mixdown(project_id: str, req: RenderRequest):
+    path = await _flushed_project_path(project_id)
 
     def _task(job_id: str) -> dict:
-        JOBS.update(job_id, progress=5, message="loading project")
-        state = ProjectState.load(path)
-
         JOBS.update(job_id, progress=40, message="mixing mixdown")
         out = render_path(project_id, "mixdown")
 
-        # 믹스다운은 전체 렌더 (region=None)
-        render_mix_to_wav(
-            state,
+        # 믹스다운은 전체 렌더 (region=None), 워커 프로세스에서 실행
+        render_pool.run(
+            render_project_file,
+            path,
             out_wav=out,
             storage_dir=CONFIG.storage_dir,
             preset_dir=getattr(CONFIG, "preset_samples_dir", None),
@@ -135,16 +231,33 @@ def create_render_mixdown(project_id: str, req: RenderRequest):
     job_id = JOBS.create("render_mixdown", _task)
     return JobResponse(job_id=job_id)
 
+async def _register_sample(project_id: str, sid: str, entry: dict) -> None:
+    """
+    생성된 샘플을 프로젝트에 등록하고 저장.
+    다른 핸들러와 같은 프로젝트 락 + 캐시를 거쳐야 서로의 저장을 덮어쓰지 않음(이벤트 루프에서 실행).
+    """
+    path = project_path(project_id)
+    async with project_cache.lock(project_id):
+        state = await project_cache.get(path)
+        with project_cache.discard_on_error(path):
+            state.samples[sid] = entry
+            await project_cache.save(path, state)
+
+
 @router.post("/api/projects/{project_id}/jobs/generate_sample", response_model=JobResponse)
-def create_generate_sample(project_id: str, req: GenerateSampleRequest):
+async def create_generate_sample(project_id: str, req: GenerateSampleRequest):
     path = project_path(project_id)
-    if not path.exists():
+    if await project_cache.get_or_none(path) is None:
         raise HTTPException(status_code=404, detail="Project not found")
+    loop = asyncio.get_running_loop()
 
-    def _task(job_id: str) -> dict:
-        JOBS.update(job_id, progress=5, message="loading project")
-        state = ProjectState.load(path)
+    def _register(sid: str, entry: dict) -> None:
+        # job 스레드 → 이벤트 루프에서 등록/저장하고 끝날 때까지 기다림
+        asyncio.run_coroutine_threadsafe(_register_sample(project_id, sid, entry), loop).result(
+            timeout=REGISTER_TIMEOUT_SEC
+        )
 
+    def _task(job_id: str) -> dict:
         sid = new_id(f"{req.instrument}_{req.base_pitch}")
         out = sample_path(project_id, sid)
 
@@ -154,53 +267,52 @@ def create_generate_sample(project_id: str, req: GenerateSampleRequest):
             if not preset_dir.exists():
                 raise RuntimeError(f"Preset dir not found: {preset_dir}")
 
-            wavs = list(preset_dir.glob("*.wav"))
+            wavs = _get_presets(preset_dir)
             if not wavs:
                 raise RuntimeError(f"No preset wav files in: {preset_dir}")
 
             JOBS.update(job_id, progress=40, message="picking preset sample")
-            src = random.choice(wavs)
+            src = wavs[random.randrange(len(wavs))]
             out.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copyfile(src, out)
+            _copy_file(src, out)
 
             JOBS.update(job_id, progress=85, message="registering preset sample")
 
-            state.samples[sid] = {
+            entry = {
                 "kind": "melodic" if req.instrument != "drums" else "drum",
                 "instrument": req.instrument,
                 "base_pitch": req.base_pitch,
                 "prompt": f"[PRESET]{src.name}",
                 "path": f"/files/samples/{project_id}/{sid}.wav",
             }
-            state.save(path)
+            _register(sid, entry)
 
-            return {"sample_id": sid, "wav_url": state.samples[sid]["path"], "preset": True}
+            return {"sample_id": sid, "wav_url": entry["path"], "preset": True}
 
         # ✅ 2) 생성 모드: Stable Audio Open으로 생성
         JOBS.update(job_id, progress=30, message="generating with Stable Audio Open")
 
-        service = StableAudioOpenService()
         gen_params = StableAudioGenParams(
             prompt=req.prompt or f"{req.instrument} one-shot sample, clean, dry",
             seconds=req.seconds,
             seed=None,
-            num_inference_steps=40,
-            guidance_scale=7.0,
         )
-        service.generate_to_wav(gen_params, out)
+        # 채팅 샘플 생성과 같은 파이프라인(프로세스당 한 번 로드), 동시 요청은 묶어서 생성
+        audio, sr = generate_batched(gen_params)
+        write_wav(out, audio, sr)
 
         JOBS.update(job_id, progress=85, message="registering generated sample")
 
-        state.samples[sid] = {
+        entry = {
             "kind": "melodic" if req.instrument != "drums" else "drum",
             "instrument": req.instrument,
             "base_pitch": req.base_pitch,
             "prompt": req.prompt,
             "path": f"/files/samples/{project_id}/{sid}.wav",
         }
-        state.save(path)
+        _register(sid, entry)
 
-        return {"sample_id": sid, "wav_url": state.samples[sid]["path"], "preset": False}
+        return {"sample_id": sid, "wav_url": entry["path"], "preset": False}
 
     job_id = JOBS.create("generate_sample", _task)
     return JobResponse(job_id=job_id)
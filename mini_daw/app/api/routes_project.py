@@ -10,7 +10,9 @@ from pydantic import BaseModel, Field
 from pathlib import Path
 
 from app.config import CONFIG
-from app.core.state import ProjectState, create_default_project
+from app.core.state import create_default_project
+from app.services import project_cache
+from app.utils.state_response import state_json_response
 
 
 router = APIRouter(prefix="/api/projects", tags=["projects"])
@@ -48,82 +50,84 @@ class UpdateTrackRequest(BaseModel):
 
 
 @router.post("")
-def create_project(req: CreateProjectRequest):
+async def create_project(req: CreateProjectRequest):
     """
     새 프로젝트 생성.
 
     반환값: ProjectState(JSON)
     """
     proj = create_default_project(req.name, req.bpm, req.bars, CONFIG.ticks_per_beat)
-    proj.save(project_path(proj.id))
-    return {"state": proj.to_dict()}
+    await project_cache.save(project_path(proj.id), proj)
+    return state_json_response(proj)
 
 
 @router.get("/{project_id}")
-def get_project(project_id: str):
+async def get_project(project_id: str):
     """
     프로젝트 상태 조회.
     """
     path = project_path(project_id)
-    if not path.exists():
+    proj = await project_cache.get_or_none(path)
+    if proj is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    proj = ProjectState.load(path)
-    return {"state": proj.to_dict()}
+    return state_json_response(proj)
 
 
 @router.patch("/{project_id}/meta")
-def update_meta(project_id: str, req: UpdateMetaRequest):
+async def update_meta(project_id: str, req: UpdateMetaRequest):
     """
     BPM/Bars/Swing 같은 메타 정보를 수정합니다.
     """
     path = project_path(project_id)
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    proj = ProjectState.load(path)
-    if req.bpm is not None:
-        proj.meta.bpm = req.bpm
-    if req.bars is not None:
-        proj.meta.bars = req.bars
-    if req.swing is not None:
-        proj.meta.swing = req.swing
-
-    # 마디가 줄어들면 이벤트가 프로젝트 범위를 넘어갈 수 있으니 clamp
-    for e in proj.events:
-        e.start_tick = proj.clamp_tick(e.start_tick)
-        e.duration_tick = max(1, min(e.duration_tick, proj.meta.ticks_per_bar))
-
-    proj.save(path)
-    return {"state": proj.to_dict()}
+    async with project_cache.lock(project_id):
+        proj = await project_cache.get_or_none(path)
+        if proj is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        with project_cache.discard_on_error(path):
+            if req.bpm is not None:
+                proj.meta.bpm = req.bpm
+            if req.bars is not None:
+                proj.meta.bars = req.bars
+            if req.swing is not None:
+                proj.meta.swing = req.swing
+
+            # 마디가 줄어들면 이벤트가 프로젝트 범위를 넘어갈 수 있으니 clamp
+            for e in proj.events:
+                e.start_tick = proj.clamp_tick(e.start_tick)
+                e.duration_tick = max(1, min(e.duration_tick, proj.meta.ticks_per_bar))
+
+            await project_cache.save(path, proj)
+    return state_json_response(proj)
 
 
 @router.patch("/{project_id}/tracks/{track_id}")
-def update_track(project_id: str, track_id: int, req: UpdateTrackRequest):
+async def update_track(project_id: str, track_id: int, req: UpdateTrackRequest):
     """
     트랙 볼륨/팬/뮤트/솔로를 수정합니다.
     """
     path = project_path(project_id)
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    proj = ProjectState.load(path)
-    track = next((t for t in proj.tracks if t.id == track_id), None)
-    if track is None:
-        raise HTTPException(status_code=404, detail="Track not found")
-
-    if req.volume is not None:
-        track.volume = req.volume
-    if req.pan is not None:
-        track.pan = req.pan
-    if req.mute is not None:
-        track.mute = req.mute
-    if req.solo is not None:
-        track.solo = req.solo
-    # ✅ Step5 추가: 트랙 기본 샘플 지정
-    if req.sample_name is not None:
-        track.sample_name = req.sample_name
-    if req.current_sample_id is not None:
-        track.current_sample_id = req.current_sample_id
-
-    proj.save(path)
-    return {"state": proj.to_dict()}
+    async with project_cache.lock(project_id):
+        proj = await project_cache.get_or_none(path)
+        if proj is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        track = proj.get_track(track_id)
+        if track is None:
+            raise HTTPException(status_code=404, detail="Track not found")
+
+        with project_cache.discard_on_error(path):
+            if req.volume is not None:
+                track.volume = req.volume
+            if req.pan is not None:
+                track.pan = req.pan
+            if req.mute is not None:
+                track.mute = req.mute
+            if req.solo is not None:
+                track.solo = req.solo
+            # ✅ Step5 추가: 트랙 기본 샘플 지정
+            if req.sample_name is not None:
+                track.sample_name = req.sample_name
+            if req.current_sample_id is not None:
+                track.current_sample_id = req.current_sample_id
+
+            await project_cache.save(path, proj)
+    return state_json_response(proj)
@@ -5,6 +5,7 @@ config.py
 환경변수로 바꾸고 싶으면 여기만 수정하면 돼요.
 """
 
+import os
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -18,12 +19,37 @@ class AppConfig:
     - default_bpm: 새 프로젝트 생성 시 기본 BPM
     - default_bars: 새 프로젝트 생성 시 기본 마디 수
     - ticks_per_beat: 내부 tick 해상도(16분 기준이면 4)
+    - llm_enabled: 룰로 처리 못 한 명령을 LLM 플래너로 넘길지(0이면 모델을 아예 로드하지 않음), 환경변수 MINI_DAW_ENABLE_LLM
+    - llm_quant: 플래너 LLM 가중치 정밀도(fp16 | bf16 | int8 | int4), 환경변수 MINI_DAW_LLM_QUANT
+    - llm_compile: 플래너 LLM torch.compile 범위(CUDA 전용, 첫 로드가 느려짐), 환경변수 MINI_DAW_LLM_COMPILE
+      0(기본)=끔, 1=forward 전체, attn=레이어별 self-attention만(컴파일이 짧음)
+    - llm_kv_quant: 플래너 KV 캐시 양자화(none | int4 | int8), 환경변수 MINI_DAW_LLM_KV_QUANT
+    - sa_steps / sa_guidance: Stable Audio 기본 디노이징 스텝 수 / CFG 스케일, 환경변수 MINI_DAW_SA_STEPS / MINI_DAW_SA_GUIDANCE
+    - sa_cfg_cutoff: Stable Audio CFG(조건/무조건 두 번 계산)를 전체 스텝 중 앞쪽 이 비율까지만(1.0=끝까지), 환경변수 MINI_DAW_SA_CFG_CUTOFF
+    - sa_quant: Stable Audio denoiser(transformer) 가중치 정밀도(fp16 | int8, CUDA 전용), 환경변수 MINI_DAW_SA_QUANT
+      (fp16은 "양자화 안 함": 실제 dtype은 Ampere 이상 GPU면 bf16, 그 전 GPU면 fp16)
+    - sa_offload: Stable Audio 모듈 CPU 오프로드(none | model | sequential, CUDA 전용, 작은 GPU용), 환경변수 MINI_DAW_SA_OFFLOAD
+    - sa_vae_tile_s: Stable Audio VAE decode를 이 길이(초) 단위로 나눠서(긴 생성의 최대 VRAM 감소, 0=끔), 환경변수 MINI_DAW_SA_VAE_TILE_S
+    - sa_max_batch: 동시에 대기 중인 Stable Audio 생성 요청을 한 번에 묶는 최대 개수(1=묶지 않음), 환경변수 MINI_DAW_SA_MAX_BATCH
+    - sa_compile: Stable Audio denoiser/VAE decode를 torch.compile(CUDA 전용, 길이 버킷마다 첫 생성이 느려짐), 환경변수 MINI_DAW_SA_COMPILE=1
     """
     storage_dir: Path = Path("storage")
     preset_samples_dir: Path = Path("storage/presets")  # ✅ 프리셋 샘플 폴더(미리 wav 넣어두기)
     default_bpm: int = 120
     default_bars: int = 4
     ticks_per_beat: int = 4
+    llm_enabled: bool = os.getenv("MINI_DAW_ENABLE_LLM", "1") == "1"
+    llm_quant: str = os.getenv("MINI_DAW_LLM_QUANT", "fp16").lower()
+    llm_compile: str = os.getenv("MINI_DAW_LLM_COMPILE", "0").lower()
+    llm_kv_quant: str = os.getenv("MINI_DAW_LLM_KV_QUANT", "none").lower()
+    sa_steps: int = int(os.getenv("MINI_DAW_SA_STEPS", "25"))
+    sa_guidance: float = float(os.getenv("MINI_DAW_SA_GUIDANCE", "6.0"))
+    sa_cfg_cutoff: float = float(os.getenv("MINI_DAW_SA_CFG_CUTOFF", "0.5"))
+    sa_quant: str = os.getenv("MINI_DAW_SA_QUANT", "fp16").lower()
+    sa_offload: str = os.getenv("MINI_DAW_SA_OFFLOAD", "none").lower()
+    sa_vae_tile_s: float = float(os.getenv("MINI_DAW_SA_VAE_TILE_S", "0"))
+    sa_max_batch: int = int(os.getenv("MINI_DAW_SA_MAX_BATCH", "4"))
+    sa_compile: bool = os.getenv("MINI_DAW_SA_COMPILE", "0") == "1"
 
 
 CONFIG = AppConfig()
@@ -1,17 +1,29 @@
 # app/core/audio/mixer.py
 from __future__ import annotations
 
+import math
+import threading
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
 import soundfile as sf
-from scipy.signal import resample_poly
+from scipy.signal import firwin, resample_poly
 
+from app.core.audio.render_stub import write_silence_wav
 from app.core.state import ProjectState
 
 
+# WAV 기록 시 한 번에 쓰는 프레임 수
+WRITE_CHUNK_FRAMES = 65536
+# 재사용할 master 버퍼 크기 종류 수(스레드/워커 프로세스별)
+MASTER_POOL_SIZE = 4
+
+_MASTER_POOL = threading.local()
+
+
 @dataclass
 class RenderRegion:
     """
@@ -28,17 +40,36 @@ def _ticks_to_seconds(ticks: int, bpm: float, ticks_per_beat: int) -> float:
     return (ticks / float(ticks_per_beat)) * sec_per_beat
 
 
+@lru_cache(maxsize=None)
+def _resample_ratio(sr: int, target_sr: int) -> tuple[int, int]:
+    """sr -> target_sr 리샘플 비율(up, down). (48000, 44100) -> (147, 160)"""
+    g = int(np.gcd(sr, target_sr))
+    return target_sr // g, sr // g
+
+
+@lru_cache(maxsize=None)
+def _resample_filter(up: int, down: int) -> np.ndarray:
+    """
+    (up, down) 리샘플용 low-pass FIR 계수(resample_poly 기본 설계와 동일: kaiser 5.0).
+    같은 변환(예: 48k -> 44.1k)마다 firwin을 다시 돌리지 않도록 캐시합니다.
+    resample_poly는 넘겨받은 window를 복사해서 쓰므로 캐시된 배열은 변하지 않습니다.
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)).astype(np.float32)
+    h.setflags(write=False)
+    return h
+
+
 def _load_wav(path: Path, target_sr: int = 44100) -> tuple[np.ndarray, int]:
     """
     WAV 로드 후 float32, shape=(samples, channels)로 정규화.
     """
     audio, sr = sf.read(str(path), always_2d=True, dtype="float32")
     if sr != target_sr:
-        # 채널별 리샘플
-        g = np.gcd(sr, target_sr)
-        up = target_sr // g
-        down = sr // g
-        audio = np.stack([resample_poly(audio[:, c], up, down) for c in range(audio.shape[1])], axis=1).astype(np.float32)
+        # 모든 채널을 한 번에 리샘플(axis=0)
+        up, down = _resample_ratio(sr, target_sr)
+        audio = resample_poly(audio, up, down, axis=0, window=_resample_filter(up, down)).astype(np.float32, copy=False)
         sr = target_sr
     return audio, sr
 
@@ -51,19 +82,38 @@ def _ensure_stereo(audio: np.ndarray) -> np.ndarray:
     return np.zeros((len(audio), 2), dtype=np.float32)
 
 
-def _apply_pan_stereo(stereo: np.ndarray, pan: float) -> np.ndarray:
+def _pan_gains(pan: float) -> tuple[float, float]:
     """
     pan: -1(left) ~ 1(right)
-    간단 constant-power pan.
+    간단 constant-power pan의 (left, right) 게인.
     """
-    pan = float(np.clip(pan, -1.0, 1.0))
+    pan = min(max(float(pan), -1.0), 1.0)
     # constant-power
-    left = np.cos((pan + 1) * np.pi / 4)   # pan=-1 => cos(0)=1, pan=+1=>cos(pi/2)=0
-    right = np.sin((pan + 1) * np.pi / 4)  # pan=-1 => sin(0)=0, pan=+1=>sin(pi/2)=1
-    out = stereo.copy()
-    out[:, 0] *= left
-    out[:, 1] *= right
-    return out
+    left = math.cos((pan + 1) * math.pi / 4)   # pan=-1 => cos(0)=1, pan=+1=>cos(pi/2)=0
+    right = math.sin((pan + 1) * math.pi / 4)  # pan=-1 => sin(0)=0, pan=+1=>sin(pi/2)=1
+    return left, right
+
+
+def _master_buffer(total_samples: int) -> np.ndarray:
+    """
+    0으로 채운 (2, total_samples) float32 master 버퍼(채널별로 연속인 planar 배치).
+    크기를 2의 거듭제곱으로 올림해서 스레드별로 재사용합니다(렌더마다 큰 배열을 새로 할당하지 않음).
+    반환값은 풀 버퍼의 view라서 다음 렌더 전까지만 유효합니다.
+    """
+    pool: dict[int, np.ndarray] = getattr(_MASTER_POOL, "bufs", None)
+    if pool is None:
+        pool = _MASTER_POOL.bufs = {}
+
+    cap = 1 << max(0, total_samples - 1).bit_length()
+    buf = pool.get(cap)
+    if buf is None:
+        if len(pool) >= MASTER_POOL_SIZE:
+            pool.pop(next(iter(pool)))
+        buf = pool[cap] = np.empty((2, cap), dtype=np.float32)
+
+    master = buf[:, :total_samples]
+    master.fill(0.0)
+    return master
 
 
 def _find_sample_path(state: ProjectState, sample_id: str, storage_dir: Path, preset_dir: Optional[Path]) -> Optional[Path]:
@@ -124,77 +174,138 @@ def render_mix_to_wav(
         start_tick = bar0 * tbar
         end_tick = min(state.meta.total_ticks, start_tick + bars * tbar)
 
-    # 소로/뮤트 계산
-    solo_on = any(t.solo for t in state.tracks)
-    def track_active(track_id: int) -> bool:
-        t = next((x for x in state.tracks if x.id == track_id), None)
-        if not t:
-            return False
-        if solo_on:
-            return t.solo
-        return not t.mute
-
     # 렌더 길이(초)
     region_ticks = max(0, end_tick - start_tick)
-    total_sec = _ticks_to_seconds(region_ticks, bpm, tpb)
-    total_samples = int(np.ceil(total_sec * sr)) + 1
-    master = np.zeros((total_samples, 2), dtype=np.float32)
+    # tick -> 샘플 수 변환 계수(이벤트마다 초 단위로 바꿨다가 다시 곱하지 않도록)
+    samples_per_tick = _ticks_to_seconds(1, bpm, tpb) * sr
+    total_samples = math.ceil(region_ticks * samples_per_tick) + 1
 
     # 트랙 파라미터 dict
     track_map = {t.id: t for t in state.tracks}
 
-    for ev in state.events:
-        if ev.start_tick < start_tick or ev.start_tick >= end_tick:
-            continue
-        if not track_active(ev.track_id):
-            continue
-
-        tr = track_map.get(ev.track_id)
-        if tr is None:
-            continue
-
-        # sample path
-        sp = _find_sample_path(state, ev.sample_id, storage_dir=storage_dir, preset_dir=preset_dir)
-        if sp is None or not sp.exists():
+    # 소로/뮤트 계산: 소리 나는 track_id 집합
+    solo_on = any(t.solo for t in state.tracks)
+    active_tids = {
+        tid for tid, t in track_map.items()
+        if (t.solo if solo_on else not t.mute)
+    }
+    # track_id -> [[volume * pan left], [volume * pan right]] (planar master에 바로 브로드캐스트)
+    track_gains = {
+        t.id: np.array([[float(t.volume) * g] for g in _pan_gains(t.pan)], dtype=np.float32)
+        for t in state.tracks
+    }
+
+    # sample_id -> 로드+리샘플+스테레오 변환된 오디오, planar (2, samples) (없는 샘플은 None)
+    # 같은 샘플을 쓰는 이벤트마다 파일을 다시 읽지 않도록 렌더 1회 동안만 캐시
+    sample_cache: dict[str, Optional[np.ndarray]] = {}
+
+    # 구간 안 + 소리 나는 트랙의 이벤트만 NumPy로 한 번에 골라냄(원래 순서 유지)
+    events = state.events
+    n_events = len(events)
+    ev_ticks = np.fromiter((e.start_tick for e in events), dtype=np.int64, count=n_events)
+    ev_tids = np.fromiter((e.track_id for e in events), dtype=np.int64, count=n_events)
+    selected = np.flatnonzero(
+        (ev_ticks >= start_tick)
+        & (ev_ticks < end_tick)
+        & np.isin(ev_tids, np.fromiter(active_tids, dtype=np.int64, count=len(active_tids)))
+    )
+
+    if selected.size == 0:
+        # 구간에 소리 날 이벤트가 없으면 master 버퍼/피크 계산 없이 무음 파일만 씀
+        write_silence_wav(out_wav, sr=sr, channels=2, nframes=total_samples)
+        return
+
+    master = _master_buffer(total_samples)
+    placed = False
+
+    for idx in selected.tolist():
+        ev = events[idx]
+
+        if ev.sample_id in sample_cache:
+            audio = sample_cache[ev.sample_id]
+        else:
+            # sample path
+            sp = _find_sample_path(state, ev.sample_id, storage_dir=storage_dir, preset_dir=preset_dir)
+            if sp is None or not sp.exists():
+                audio = None
+            else:
+                audio, _ = _load_wav(sp, target_sr=sr)
+                # master와 같은 planar 배치로 바꿔 두면 채널별 누적이 연속 메모리 연산이 됨
+                audio = np.ascontiguousarray(_ensure_stereo(audio).T)
+            sample_cache[ev.sample_id] = audio
+        if audio is None:
             # 샘플이 없으면 그냥 스킵(렌더는 계속)
             continue
 
-        audio, _ = _load_wav(sp, target_sr=sr)
-        audio = _ensure_stereo(audio)
-
-        # 이벤트 길이(초) — duration_tick 기준으로 자르기/패딩
+        # 이벤트 길이(샘플 수) — duration_tick 기준으로 자름
+        # (샘플이 더 짧으면 패딩 버퍼 없이 샘플 길이만큼만 더함, 나머지는 무음)
         dur_ticks = max(1, int(ev.duration_tick))
-        ev_sec = _ticks_to_seconds(dur_ticks, bpm, tpb)
-        ev_len = int(np.ceil(ev_sec * sr))
+        ev_len = math.ceil(dur_ticks * samples_per_tick)
 
-        if len(audio) > ev_len:
-            audio = audio[:ev_len, :]
-        elif len(audio) < ev_len:
-            pad = np.zeros((ev_len - len(audio), 2), dtype=np.float32)
-            audio = np.vstack([audio, pad])
-
-        # gain: velocity * track.volume
+        # gain(velocity * track.volume)과 pan을 한 번의 곱셈으로 master에 바로 더함
         vel = float(getattr(ev, "velocity", 1.0) or 1.0)
-        gain = float(tr.volume) * vel
-        audio = audio * gain
-
-        # pan
-        audio = _apply_pan_stereo(audio, float(tr.pan))
+        gains = track_gains[ev.track_id] * vel
 
         # 시작 위치(샘플 인덱스)
         local_start_tick = ev.start_tick - start_tick
-        start_sec = _ticks_to_seconds(local_start_tick, bpm, tpb)
-        start_i = int(np.round(start_sec * sr))
-        end_i = min(total_samples, start_i + len(audio))
+        start_i = round(local_start_tick * samples_per_tick)
         if start_i >= total_samples:
             continue
+        n = min(ev_len, audio.shape[1], total_samples - start_i)
+        end_i = start_i + n
+
+        # 두 채널을 한 번의 NumPy 연산으로 누적(이벤트당 Python->NumPy 호출 수 최소화)
+        master[:, start_i:end_i] += audio[:, :n] * gains
+        placed = True
 
-        master[start_i:end_i, :] += audio[: (end_i - start_i), :]
+    if not placed:
+        # 이벤트는 있었지만 샘플이 없거나 범위 밖이라 아무것도 안 더해짐
+        write_silence_wav(out_wav, sr=sr, channels=2, nframes=total_samples)
+        return
 
     # 간단 리미팅/클리핑 방지
-    peak = float(np.max(np.abs(master))) if master.size else 0.0
+    # abs 배열을 따로 만들지 않고 max/min 두 번의 reduction으로 peak 계산
+    peak = max(float(master.max()), -float(master.min())) if master.size else 0.0
     if peak > 0.98:
-        master *= (0.98 / peak)
+        np.multiply(master, 0.98 / peak, out=master)
 
     out_wav.parent.mkdir(parents=True, exist_ok=True)
-    sf.write(str(out_wav), master, sr)
+    # 긴 mixdown도 float->int16 변환이 캐시에 맞는 크기로 나눠서 흘러가도록 청크 단위로 기록
+    # (planar -> interleaved 변환도 청크 단위로만 함)
+    with sf.SoundFile(str(out_wav), mode="w", samplerate=sr, channels=2, subtype="PCM_16") as f:
+        for i in range(0, total_samples, WRITE_CHUNK_FRAMES):
+            f.write(np.ascontiguousarray(master[:, i:i + WRITE_CHUNK_FRAMES].T))
+
+
+@lru_cache(maxsize=32)
+def _load_state_cached(path: str, mtime_ns: int, size: int) -> ProjectState:
+    """
+    (경로, mtime, 크기)가 같으면 파싱해 둔 ProjectState 재사용(같은 프로젝트 연속 프리뷰용).
+    렌더는 state를 읽기만 하므로 캐시된 객체를 그대로 넘겨도 안전합니다.
+    """
+    return ProjectState.load(Path(path))
+
+
+def render_project_file(
+    project_file: Path,
+    *,
+    out_wav: Path,
+    storage_dir: Path,
+    preset_dir: Optional[Path] = None,
+    region: Optional[RenderRegion] = None,
+    sr: int = 44100,
+) -> None:
+    """
+    프로젝트 JSON 파일을 읽어서 render_mix_to_wav로 렌더.
+    (render_pool 워커 프로세스용 — 인자가 전부 pickle 가능한 값)
+    """
+    st = project_file.stat()
+    state = _load_state_cached(str(project_file), st.st_mtime_ns, st.st_size)
+    render_mix_to_wav(
+        state,
+        out_wav=out_wav,
+        storage_dir=storage_dir,
+        preset_dir=preset_dir,
+        region=region,
+        sr=sr,
+    )
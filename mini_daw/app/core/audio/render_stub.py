@@ -10,25 +10,41 @@ Step4에서 렌더링 파이프라인이 아직 없으므로,
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Optional
 import wave
-import struct
 
+# 무음 기록 단위(바이트)
+_CHUNK_BYTES = 1 << 16
 
-def write_silence_wav(path: Path, seconds: float = 2.0, sr: int = 44100) -> None:
+
+def write_silence_wav(
+    path: Path,
+    seconds: float = 2.0,
+    sr: int = 44100,
+    *,
+    channels: int = 1,
+    nframes: Optional[int] = None,
+) -> None:
     """
     무음 WAV 파일 생성.
 
     - 16-bit PCM
-    - mono
+    - 기본 mono (channels=2면 stereo)
+    - nframes를 주면 seconds 대신 프레임 수를 그대로 사용(믹서의 빈 렌더용)
     """
     path.parent.mkdir(parents=True, exist_ok=True)
 
-    nframes = int(seconds * sr)
+    if nframes is None:
+        nframes = int(seconds * sr)
     with wave.open(str(path), "wb") as wf:
-        wf.setnchannels(1)
+        wf.setnchannels(channels)
         wf.setsampwidth(2)  # 16-bit
         wf.setframerate(sr)
 
-        # 무음(0) 샘플을 쭉 씀
-        silence_frame = struct.pack("<h", 0)
-        wf.writeframes(silence_frame * nframes)
+        # 무음(0) 샘플을 64KB 단위로 씀(전체 길이만큼 bytes를 만들지 않음)
+        remaining = 2 * channels * nframes
+        zeros = bytes(min(_CHUNK_BYTES, remaining))
+        while remaining > 0:
+            n = min(len(zeros), remaining)
+            wf.writeframes(zeros[:n])
+            remaining -= n
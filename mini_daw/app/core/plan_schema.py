@@ -9,7 +9,7 @@ LLM(또는 규칙 기반 플래너)이 반환하는 "편집 계획(Plan)"의 스
 from __future__ import annotations
 
 from typing import Any, Literal, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 ToolName = Literal[
@@ -54,6 +54,8 @@ class ChatRequest(BaseModel):
     """
     /chat 요청 바디.
     """
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     message: str
     # UI가 필요하면 힌트를 추가할 수 있지만 Step2에서는 안 씀
     client_state_hint: Optional[dict[str, Any]] = None
@@ -12,20 +12,27 @@ Step6: last_selected 지원 추가
 
 from __future__ import annotations
 
+from collections import deque
 from dataclasses import dataclass, field
 
-@dataclass
+# undo로 되돌릴 수 있는 최대 단계 수(넘으면 가장 오래된 것부터 버림)
+MAX_UNDO_DEPTH = 100
+
+@dataclass(slots=True)
 class ExecContext:
     """
     실행 컨텍스트(프로젝트별 메모리).
 
     - last_created_event_ids: 최근 생성 이벤트들
     - last_selected_event_ids: 최근 선택 이벤트들 (UI에서 클릭)
-    - history_events_stack: undo용 events 스냅샷
+    - history_ops_stack: undo 로그. 툴 호출 1번당 역연산(op) 목록 1개
+      (형식은 edit_tools._begin_undo 참고, 최근 MAX_UNDO_DEPTH개까지만 보관)
     """
     last_created_event_ids: list[str] = field(default_factory=list)
     last_selected_event_ids: list[str] = field(default_factory=list)
-    history_events_stack: list[list[dict]] = field(default_factory=list)
+    history_ops_stack: deque[list[tuple]] = field(
+        default_factory=lambda: deque(maxlen=MAX_UNDO_DEPTH)
+    )
 
     def last_created(self) -> str | None:
         return self.last_created_event_ids[-1] if self.last_created_event_ids else None
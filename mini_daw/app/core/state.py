@@ -8,19 +8,43 @@ state.py
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from pathlib import Path
 from typing import Literal, Optional
-import json
+import itertools
+import os
+import sys
 import uuid
 
+import orjson
+
 
 TrackType = Literal["drum", "melodic"]
 
+# ProjectState JSON 인코딩 공통 옵션(samples 등에 str이 아닌 키가 섞여도 실패하지 않도록)
+_JSON_OPTS = orjson.OPT_NON_STR_KEYS
+
+# ProjectState.version 발급용(프로세스 전체에서 단조 증가 → 다시 로드된 state와도 안 겹침)
+_VERSIONS = itertools.count(1)
+
+
+# new_id용: 프로세스별 랜덤 salt + 카운터(호출마다 uuid4/os.urandom을 부르지 않도록)
+_ID_SALT = os.urandom(3).hex()
+_ID_COUNTER = itertools.count()
+
 
 def new_id(prefix: str) -> str:
-    """짧고 충돌 위험이 낮은 ID를 만드는 유틸."""
-    return f"{prefix}_{uuid.uuid4().hex[:10]}"
+    """짧고 충돌 위험이 낮은 ID를 만드는 유틸(프로세스 안에서는 항상 유일)."""
+    return f"{prefix}_{_ID_SALT}{next(_ID_COUNTER):07x}"
+
+
+def temp_path_for(path: Path) -> Path:
+    """
+    원자적 저장용 임시 파일 경로(같은 폴더, 저장마다 다른 이름).
+    임시 파일에 다 쓴 뒤 os.replace(tmp, path)로 바꿔치기하면
+    저장 도중에 죽어도 반쯤 쓴 JSON이 남지 않습니다.
+    """
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
 
 
 @dataclass
@@ -33,22 +57,55 @@ class ProjectMeta:
     - bars: 마디 수
     - ticks_per_beat: 내부 해상도 (16분 기준 4)
     - ticks_per_bar: 한 마디 tick 수 (4/4면 4beats * ticks_per_beat)
+    - total_ticks: 프로젝트 전체 tick 수 (bars * ticks_per_bar)
     - swing: 0.0 ~ 0.5 권장 (렌더링에서 오프비트를 뒤로 미루는 용도)
+
+    ticks_per_bar/total_ticks는 clamp_tick/parse_time 등에서 매번 읽히므로
+    매번 곱하지 않고, time_signature/bars/ticks_per_beat가 대입될 때 미리 계산해 둡니다.
+    (time_signature 리스트를 제자리 수정하면 감지 못 함 → 새 리스트를 대입)
     """
     time_signature: list[int] = field(default_factory=lambda: [4, 4])
     bpm: int = 120
     bars: int = 4
     ticks_per_beat: int = 4
     swing: float = 0.0
+    # as_hint 캐시(필드에 값을 대입하면 __setattr__에서 비움)
+    _hint: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value) -> None:
+        if name != "_hint":
+            object.__setattr__(self, "_hint", None)
+        object.__setattr__(self, name, value)
+        if name in _TICK_SOURCE_FIELDS:
+            self._recompute_ticks()
+
+    def _recompute_ticks(self) -> None:
+        # __init__ 도중(필드가 아직 다 없을 때)은 건너뜀
+        d = self.__dict__
+        if "time_signature" in d and "bars" in d and "ticks_per_beat" in d:
+            beats_per_bar = d["time_signature"][0]  # 4/4의 4
+            d["ticks_per_bar"] = beats_per_bar * d["ticks_per_beat"]
+            d["total_ticks"] = d["bars"] * d["ticks_per_bar"]
 
     @property
-    def ticks_per_bar(self) -> int:
-        beats_per_bar = self.time_signature[0]  # 4/4의 4
-        return beats_per_bar * self.ticks_per_beat
+    def as_hint(self) -> dict:
+        """
+        LLM 플래너에 넘기는 state_hint dict.
+        메타 필드가 바뀌기 전까지 같은 dict를 재사용하므로 읽기 전용으로만 사용하세요.
+        """
+        if self._hint is None:
+            self._hint = {
+                "bpm": self.bpm,
+                "bars": self.bars,
+                "ticks_per_bar": self.ticks_per_bar,
+                "ticks_per_beat": self.ticks_per_beat,
+                "total_ticks": self.total_ticks,
+            }
+        return self._hint
 
-    @property
-    def total_ticks(self) -> int:
-        return self.bars * self.ticks_per_bar
+
+# 이 필드들이 바뀌면 ProjectMeta.ticks_per_bar/total_ticks 재계산
+_TICK_SOURCE_FIELDS = frozenset({"time_signature", "bars", "ticks_per_beat"})
 
 
 @dataclass
@@ -73,7 +130,7 @@ class Track:
     sample_name: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class Event:
     """
     타임라인에 배치된 이벤트(노트/드럼/클립).
@@ -82,6 +139,8 @@ class Event:
     - type: drum | melodic
     - sample_id: 샘플 키(현재는 문자열만 유지, 나중에 실제 wav 경로로 연결)
     - pitch: melodic일 때만 사용(C4 등)
+
+    프로젝트마다 수백~수천 개 생기므로 __slots__ 사용(__dict__ 없음 → to_dict()로 직렬화).
     """
     id: str
     track_id: int
@@ -92,6 +151,52 @@ class Event:
     velocity: float = 0.8
     pitch: Optional[str] = None
 
+    def __post_init__(self) -> None:
+        # type/sample_id는 종류가 몇 개 안 되는 문자열이라 intern
+        # → 툴의 스캔(e.type == "drum" and e.sample_id == ...)이 대부분 포인터 비교로 끝남
+        self.type = sys.intern(self.type)
+        if self.sample_id is not None:
+            self.sample_id = sys.intern(self.sample_id)
+
+    def to_dict(self) -> dict:
+        """JSON 저장/전송/undo 기록용 dict."""
+        return {
+            "id": self.id,
+            "track_id": self.track_id,
+            "start_tick": self.start_tick,
+            "duration_tick": self.duration_tick,
+            "type": self.type,
+            "sample_id": self.sample_id,
+            "velocity": self.velocity,
+            "pitch": self.pitch,
+        }
+
+    def to_tuple(self) -> tuple:
+        """필드 값 튜플(필드 순서 그대로). Event(*t)로 바로 복원 가능(undo 기록용)."""
+        return (
+            self.id,
+            self.track_id,
+            self.start_tick,
+            self.duration_tick,
+            self.type,
+            self.sample_id,
+            self.velocity,
+            self.pitch,
+        )
+
+
+def _from_fields(cls, field_names: frozenset[str], d: dict):
+    """
+    dict 키가 dataclass 필드와 정확히 같으면 __init__을 거치지 않고 d를 그대로 __dict__로 사용.
+    (JSON 로드처럼 d를 새로 만든 경우 전용 — d를 다른 곳에서 계속 쓰면 안 됨)
+    키가 다르면(예전 파일에 필드 누락 등) 일반 생성자로 기본값/에러 처리를 그대로 따릅니다.
+    """
+    if d.keys() == field_names:
+        obj = object.__new__(cls)
+        obj.__dict__ = d
+        return obj
+    return cls(**d)
+
 
 @dataclass
 class ProjectState:
@@ -109,6 +214,68 @@ class ProjectState:
     tracks: list[Track]
     events: list[Event] = field(default_factory=list)
     samples: dict = field(default_factory=dict)
+    # event id -> Event 인덱스 (직렬화 대상 아님, events 변경 시 함께 갱신)
+    _by_id: dict[str, Event] = field(default_factory=dict, init=False, repr=False, compare=False)
+    # track id -> Track 인덱스 (트랙은 생성 후 추가/삭제되지 않음, tracks를 바꾸면 reindex_tracks())
+    _tracks_by_id: dict[int, Track] = field(default_factory=dict, init=False, repr=False, compare=False)
+    # 변경 버전: save()/touch() 때마다 새 값. 직렬화 결과 캐시의 키
+    version: int = field(default=0, init=False, repr=False, compare=False)
+    _json_cache: Optional[tuple[int, bytes]] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.reindex_tracks()
+        self.reindex_events()
+        self.touch()
+
+    def touch(self) -> None:
+        """상태가 바뀌었음을 표시(버전 갱신 → 직렬화 캐시 무효화)."""
+        self.version = next(_VERSIONS)
+
+    # ---------- track index ----------
+    def reindex_tracks(self) -> None:
+        """tracks 리스트를 통째로 바꿨을 때 id 인덱스를 다시 만듭니다."""
+        self._tracks_by_id = {t.id: t for t in self.tracks}
+
+    def get_track(self, track_id: int) -> Optional[Track]:
+        """track_id로 트랙 조회. 없으면 None."""
+        return self._tracks_by_id.get(track_id)
+
+    # ---------- event index ----------
+    def reindex_events(self) -> None:
+        """events 리스트를 통째로 바꿨을 때 id 인덱스를 다시 만듭니다."""
+        self._by_id = {e.id: e for e in self.events}
+
+    def get_event(self, event_id: str) -> Optional[Event]:
+        """event_id로 이벤트를 O(1) 조회. 없으면 None."""
+        return self._by_id.get(event_id)
+
+    def add_event(self, ev: Event) -> None:
+        """이벤트 추가(인덱스 동기화 포함)."""
+        self.events.append(ev)
+        self._by_id[ev.id] = ev
+
+    def add_events(self, evs: list[Event]) -> None:
+        """이벤트 여러 개를 한 번에 추가(패턴 적용 등, 인덱스 동기화 포함)."""
+        self.events.extend(evs)
+        self._by_id.update((ev.id, ev) for ev in evs)
+
+    def insert_event(self, idx: int, ev: Event) -> None:
+        """이벤트를 리스트의 idx 위치에 삽입(undo 복원용, 인덱스 동기화 포함)."""
+        self.events.insert(idx, ev)
+        self._by_id[ev.id] = ev
+
+    def remove_event_at(self, idx: int) -> Event:
+        """리스트 위치로 이벤트 삭제(인덱스 동기화 포함)."""
+        ev = self.events.pop(idx)
+        self._by_id.pop(ev.id, None)
+        return ev
+
+    def remove_event(self, event_id: str) -> Optional[Event]:
+        """event_id로 이벤트 삭제. 없으면 None."""
+        ev = self._by_id.pop(event_id, None)
+        if ev is not None:
+            self.events.remove(ev)
+        return ev
 
     # ---------- time parsing ----------
     def parse_time(self, t: str | int) -> int:
@@ -120,16 +287,16 @@ class ProjectState:
         - "bar:step": bar는 1-based, step은 1..ticks_per_bar(기본 1..16)
           예) "3:1" = 3마디 시작
         """
-        if isinstance(t, int):
+        # bool도 int 하위 타입이라 isinstance로는 tick으로 통과해버리므로 type()으로 비교
+        if type(t) is int:
             return t
-        if ":" not in t:
-            raise ValueError(f"Invalid time format: {t}")
+        if type(t) is not str:
+            raise ValueError(f"Invalid time format: {t!r}")
 
-        bar_s, step_s = t.split(":")
-        bar = int(bar_s) - 1
-        step = int(step_s) - 1
-        tick = bar * self.meta.ticks_per_bar + step
-        return tick
+        bar_s, sep, step_s = t.partition(":")
+        if not sep:
+            raise ValueError(f"Invalid time format: {t}")
+        return (int(bar_s) - 1) * self.meta.ticks_per_bar + int(step_s) - 1
 
     def clamp_tick(self, tick: int) -> int:
         """프로젝트 범위를 넘어가지 않게 tick을 clamp."""
@@ -138,6 +305,17 @@ class ProjectState:
     # ---------- serialization ----------
     def to_dict(self) -> dict:
         """JSON 저장/전송용 dict로 변환."""
+        return self._as_dict([event.to_dict() for event in self.events])
+
+    def _json_obj(self) -> dict:
+        """
+        orjson 인코딩용 dict. events는 Event 객체 그대로 넘겨서
+        orjson이 dataclass를 직접 직렬화하게 합니다(이벤트마다 dict를 만들지 않음).
+        결과 JSON은 to_dict()를 인코딩한 것과 같습니다.
+        """
+        return self._as_dict(self.events)
+
+    def _as_dict(self, events: list) -> dict:
         return {
             "id": self.id,
             "name": self.name,
@@ -151,13 +329,28 @@ class ProjectState:
                 "swing": self.meta.swing,
             },
             "tracks": [track.__dict__ for track in self.tracks],
-            "events": [event.__dict__ for event in self.events],
+            "events": events,
             "samples": self.samples,
         }
 
+    def to_json_bytes(self) -> bytes:
+        """
+        to_dict()의 JSON 바이트. 같은 version이면 이전 결과를 재사용합니다.
+        (events를 직접 수정했다면 save() 또는 touch() 이후에 호출)
+        """
+        cached = self._json_cache
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        data = orjson.dumps(self._json_obj(), option=_JSON_OPTS)
+        self._json_cache = (self.version, data)
+        return data
+
     @staticmethod
     def from_dict(d: dict) -> "ProjectState":
-        """dict에서 ProjectState 복원."""
+        """
+        dict에서 ProjectState 복원.
+        d["tracks"]의 dict들은 Track의 __dict__로 그대로 쓰이므로 호출 후 재사용하지 않습니다.
+        """
         meta = ProjectMeta(
             time_signature=d["meta"]["time_signature"],
             bpm=d["meta"]["bpm"],
@@ -165,7 +358,7 @@ class ProjectState:
             ticks_per_beat=d["meta"].get("ticks_per_beat", 4),
             swing=d["meta"].get("swing", 0.0),
         )
-        tracks = [Track(**t) for t in d["tracks"]]
+        tracks = [_from_fields(Track, _TRACK_FIELDS, t) for t in d["tracks"]]
         events = [Event(**e) for e in d.get("events", [])]
         return ProjectState(
             id=d["id"],
@@ -179,25 +372,21 @@ class ProjectState:
     def recompute_meta(self) -> None:
         """
         meta 값 재계산.
-        ProjectMeta.total_ticks가 @property(읽기 전용)인 경우를 지원합니다.
+        (ProjectMeta.ticks_per_bar/total_ticks는 필드 대입 시 자동으로 다시 계산됨)
 
         갱신 대상:
         - ticks_per_beat (없으면 4)
-        - ticks_per_bar  (없으면 ticks_per_beat * 4)
         - bars           (이미 바뀐 값 그대로 사용)
+        - 범위 밖으로 나간 이벤트 start_tick clamp
         """
         if not getattr(self, "meta", None):
             return
 
-        # 기본값 보정
+        # 기본값 보정(대입하면 ticks_per_bar/total_ticks도 같이 다시 계산됨)
         if not getattr(self.meta, "ticks_per_beat", None):
             self.meta.ticks_per_beat = 4
 
-        if not getattr(self.meta, "ticks_per_bar", None):
-            self.meta.ticks_per_bar = int(self.meta.ticks_per_beat) * 4
-
-        # ✅ total_ticks는 property라서 대입하지 않습니다.
-        total = int(self.meta.ticks_per_bar) * int(self.meta.bars)
+        total = self.meta.total_ticks
 
         # bars를 줄여서 범위 밖이 되면 clamp(또는 삭제)
         for e in self.events:
@@ -206,16 +395,31 @@ class ProjectState:
 
 
 
+    def dumps(self) -> bytes:
+        """저장 파일용 JSON(UTF-8 바이트, 2칸 들여쓰기)."""
+        return orjson.dumps(self._json_obj(), option=_JSON_OPTS | orjson.OPT_INDENT_2)
+
+    @staticmethod
+    def loads(data: str | bytes) -> "ProjectState":
+        """저장 파일 JSON(문자열/바이트)에서 복원."""
+        return ProjectState.from_dict(orjson.loads(data))
+
     def save(self, path: Path) -> None:
-        """프로젝트 상태를 JSON 파일로 저장."""
+        """프로젝트 상태를 JSON 파일로 저장(임시 파일에 쓰고 교체 → 원자적)."""
+        self.touch()
         path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp = temp_path_for(path)
+        try:
+            tmp.write_bytes(self.dumps())
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
 
     @staticmethod
     def load(path: Path) -> "ProjectState":
         """JSON 파일에서 프로젝트 상태를 로드."""
-        d = json.loads(path.read_text(encoding="utf-8"))
-        return ProjectState.from_dict(d)
+        return ProjectState.loads(path.read_bytes())
     
 #Step5 : 선택된 샘플” 필드 추가
 @dataclass
@@ -237,6 +441,8 @@ class Track:
     current_sample_id: str = ""   # ✅ 추가
 
 
+_TRACK_FIELDS = frozenset(f.name for f in fields(Track))
+
 
 def create_default_project(name: str, bpm: int, bars: int, ticks_per_beat: int) -> ProjectState:
     """
@@ -11,17 +11,22 @@ drum_tools.py
 
 from __future__ import annotations
 
+import sys
 from typing import Literal
 from app.core.state import ProjectState, Event, new_id
 from app.core.refs import ExecContext
-from app.core.tools.edit_tools import _push_undo_snapshot
+from app.core.tools.edit_tools import _begin_undo, _record_removed
 
 DrumName = Literal["kick", "snare", "hihat"]
 
+# Event 쪽 sample_id와 같은 객체가 되도록 intern (Event.__post_init__ 참고)
 DRUM_SAMPLE_ID = {
-    "kick": "drum_kick_001",
-    "snare": "drum_snare_001",
-    "hihat": "drum_hihat_001",
+    k: sys.intern(v)
+    for k, v in {
+        "kick": "drum_kick_001",
+        "snare": "drum_snare_001",
+        "hihat": "drum_hihat_001",
+    }.items()
 }
 
 
@@ -43,7 +48,7 @@ def toggle_drum(
     반환:
     - "deleted" 또는 생성된 event_id
     """
-    _push_undo_snapshot(state, ctx)
+    ops = _begin_undo(ctx)
 
     start_tick = state.clamp_tick(int(start_tick))
     sample_id = DRUM_SAMPLE_ID[drum]
@@ -61,7 +66,7 @@ def toggle_drum(
             break
 
     if idx is not None:
-        del state.events[idx]
+        _record_removed(ops, [(idx, state.remove_event_at(idx))])
         return "deleted"
 
     eid = new_id("e")
@@ -75,7 +80,8 @@ def toggle_drum(
         velocity=float(velocity),
         pitch=None,
     )
-    state.events.append(ev)
+    state.add_event(ev)
+    ops.append(("del", eid))
     ctx.last_created_event_ids.append(eid)
     return eid
 
@@ -96,7 +102,7 @@ def apply_pattern_four(
     - overwrite=True이면 기존 같은 악기(sample_id)의 동일 박 위치는 먼저 삭제하고 다시 생성
     반환: 생성된 이벤트 개수
     """
-    _push_undo_snapshot(state, ctx)
+    ops = _begin_undo(ctx)
 
     ticks_per_bar = state.meta.ticks_per_bar
     bars = state.meta.bars
@@ -105,53 +111,53 @@ def apply_pattern_four(
     beat_starts = [0, state.meta.ticks_per_beat, 2 * state.meta.ticks_per_beat, 3 * state.meta.ticks_per_beat]
     sample_id = DRUM_SAMPLE_ID[drum]
 
-    created = 0
+    # 패턴이 들어갈 tick 전체(마디 수 x 4박)를 한 번에 계산해 두고 set으로 조회
+    pattern_ticks = [b * ticks_per_bar + s for b in range(bars) for s in beat_starts]
+    target_ticks = set(pattern_ticks)
 
-    # overwrite면 먼저 제거
+    def _same_drum(e: Event) -> bool:
+        return e.track_id == track_id and e.type == "drum" and e.sample_id == sample_id
+
+    # overwrite면 먼저 제거(beat 위치에 해당하는 것만)
     if overwrite:
         keep = []
-        for e in state.events:
-            if e.track_id == track_id and e.type == "drum" and e.sample_id == sample_id:
-                # beat 위치에 해당하는 것만 제거
-                in_any = False
-                for b in range(bars):
-                    base = b * ticks_per_bar
-                    if e.start_tick in [base + s for s in beat_starts]:
-                        in_any = True
-                        break
-                if in_any:
-                    continue
+        removed = []
+        for i, e in enumerate(state.events):
+            if _same_drum(e) and e.start_tick in target_ticks:
+                removed.append((i, e))
+                continue
             keep.append(e)
+        _record_removed(ops, removed)
         state.events = keep
-
-    # 생성
-    for b in range(bars):
-        base = b * ticks_per_bar
-        for s in beat_starts:
-            start_tick = base + s
-
-            # 이미 있으면 스킵(토글이 아니라 패턴이니까)
-            exists = any(
-                (e.track_id == track_id and e.type == "drum" and e.start_tick == start_tick and e.sample_id == sample_id)
-                for e in state.events
+        state.reindex_events()
+
+    # 같은 악기 이벤트가 이미 있는 tick들(events는 한 번만 스캔)
+    existing = {e.start_tick for e in state.events if _same_drum(e)}
+
+    # 생성(로컬 리스트에 모았다가 한 번에 추가)
+    new_events: list[Event] = []
+    for start_tick in pattern_ticks:
+        # 이미 있으면 스킵(토글이 아니라 패턴이니까)
+        if start_tick in existing:
+            continue
+        existing.add(start_tick)
+        new_events.append(
+            Event(
+                id=new_id("e"),
+                track_id=track_id,
+                start_tick=start_tick,
+                duration_tick=1,
+                type="drum",
+                sample_id=sample_id,
+                velocity=float(velocity),
+                pitch=None,
             )
-            if exists:
-                continue
+        )
 
-            eid = new_id("e")
-            state.events.append(
-                Event(
-                    id=eid,
-                    track_id=track_id,
-                    start_tick=start_tick,
-                    duration_tick=1,
-                    type="drum",
-                    sample_id=sample_id,
-                    velocity=float(velocity),
-                    pitch=None,
-                )
-            )
-            ctx.last_created_event_ids.append(eid)
-            created += 1
+    state.add_events(new_events)
+    new_ids = [ev.id for ev in new_events]
+    ops.extend(("del", eid) for eid in new_ids)
+    ctx.last_created_event_ids.extend(new_ids)
+    created = len(new_events)
 
     return created
@@ -9,36 +9,73 @@ Step2 범위:
 - place_note
 - move_event
 - delete_event
-- undo (스냅샷 기반)
+- undo (역연산 로그 기반)
 """
 
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Optional
-from copy import deepcopy
 
 from app.core.state import ProjectState, Event, new_id
 from app.core.refs import ExecContext
 
 
-def _push_undo_snapshot(state: ProjectState, ctx: ExecContext) -> None:
+def _begin_undo(ctx: ExecContext) -> list[tuple]:
     """
-    Undo를 위해 events만 스냅샷으로 저장합니다.
-    (나중에 tracks/meta/samples까지 확장 가능)
+    이번 툴 호출의 undo 기록을 시작합니다(툴 호출 1번 = undo 1단계).
+    events 전체를 스냅샷하지 않고, 바뀐 부분의 역연산(op)만 반환된 리스트에 쌓습니다.
+
+    op 형식:
+    - ("del", event_id): 생성 취소 → 해당 이벤트 삭제
+    - ("add", event_values, index): 삭제 취소 → Event(*event_values)를 원래 위치에 다시 삽입
+    - ("set", event_id, {field: old_value}): 필드 변경 취소
+
+    대상이 없어서 아무것도 안 바뀌는 호출(이동/삭제/pitch 변경 등)은
+    대상을 확인한 뒤에 호출해서 undo 단계를 남기지 않습니다.
     """
-    ctx.history_events_stack.append(deepcopy([e.__dict__ for e in state.events]))
+    ops: list[tuple] = []
+    ctx.history_ops_stack.append(ops)
+    return ops
+
+
+def _record_removed(ops: list[tuple], removed: list[tuple[int, Event]]) -> None:
+    """
+    삭제된 (원래 index, Event)들을 기록합니다(index는 삭제 직전 기준).
+    undo는 op를 역순으로 적용하므로 index 내림차순으로 쌓아서
+    복원 시 오름차순으로 끼워 넣으면 원래 순서가 그대로 됩니다.
+    """
+    for idx, ev in sorted(removed, key=lambda x: x[0], reverse=True):
+        ops.append(("add", ev.to_tuple(), idx))
+
+
+def _revert(state: ProjectState, op: tuple) -> None:
+    kind = op[0]
+    if kind == "del":
+        state.remove_event(op[1])
+    elif kind == "add":
+        values, idx = op[1], op[2]
+        # values[0] == event id
+        if state.get_event(values[0]) is None:
+            state.insert_event(idx, Event(*values))
+    elif kind == "set":
+        ev = state.get_event(op[1])
+        if ev is not None:
+            for k, v in op[2].items():
+                setattr(ev, k, v)
 
 
 def undo(state: ProjectState, ctx: ExecContext, steps: int = 1) -> None:
     """
-    최근 스냅샷으로 되돌립니다.
+    최근 툴 호출을 역연산으로 되돌립니다.
+    기록은 최근 MAX_UNDO_DEPTH(100)단계까지만 남으므로 그보다 오래된 편집은 되돌릴 수 없습니다.
     """
     for _ in range(steps):
-        if not ctx.history_events_stack:
+        if not ctx.history_ops_stack:
             return
-        snapshot = ctx.history_events_stack.pop()
-        # Event 객체로 복원
-        state.events = [Event(**d) for d in snapshot]
+        ops = ctx.history_ops_stack.pop()
+        for op in reversed(ops):
+            _revert(state, op)
 
 
 def place_drum(
@@ -56,7 +93,7 @@ def place_drum(
 
     start는 tick(int) 또는 "bar:step" 문자열을 지원합니다.
     """
-    _push_undo_snapshot(state, ctx)
+    ops = _begin_undo(ctx)
 
     start_tick = state.clamp_tick(state.parse_time(start))
     dur = max(1, duration_tick)
@@ -72,7 +109,8 @@ def place_drum(
         velocity=velocity,
         pitch=None,
     )
-    state.events.append(ev)
+    state.add_event(ev)
+    ops.append(("del", eid))
     ctx.last_created_event_ids.append(eid)
     return eid
 
@@ -95,14 +133,14 @@ def place_note(
     - 해당 트랙의 current_sample_id를 사용
     - 그것도 비어 있으면 fallback으로 "bass_A1_001"
     """
-    _push_undo_snapshot(state, ctx)
+    ops = _begin_undo(ctx)
 
     start_tick = state.clamp_tick(state.parse_time(start))
     dur = max(1, duration_tick)
 
     # ✅ 트랙의 기본 샘플 자동 선택
     if sample_id is None:
-        tr = next((t for t in state.tracks if t.id == track_id), None)
+        tr = state.get_track(track_id)
         sample_id = (tr.current_sample_id if tr and tr.current_sample_id else "bass_A1_001")
 
     eid = new_id("e")
@@ -116,7 +154,8 @@ def place_note(
         velocity=velocity,
         pitch=pitch,
     )
-    state.events.append(ev)
+    state.add_event(ev)
+    ops.append(("del", eid))
     ctx.last_created_event_ids.append(eid)
     return eid
 
@@ -133,8 +172,6 @@ def move_event(
     이벤트 이동.
     - event_id 또는 event_ref("last_created")로 대상을 찾습니다.
     """
-    _push_undo_snapshot(state, ctx)
-
     # Step 6 : last_selected 지원 추가
     target_id = event_id
     if target_id is None:
@@ -146,10 +183,12 @@ def move_event(
     if not target_id:
         return
 
-    ev = next((e for e in state.events if e.id == target_id), None)
+    ev = state.get_event(target_id)
     if ev is None:
         return
 
+    ops = _begin_undo(ctx)
+    ops.append(("set", ev.id, {"start_tick": ev.start_tick}))
     ev.start_tick = state.clamp_tick(ev.start_tick + int(delta_tick))
 
 
@@ -164,8 +203,6 @@ def delete_event(
     이벤트 삭제.
     - event_id 또는 event_ref("last_created" | "last_selected")
     """
-    _push_undo_snapshot(state, ctx)
-
     target_id = event_id
     if target_id is None:
         if event_ref == "last_created":
@@ -176,7 +213,12 @@ def delete_event(
     if not target_id:
         return
 
-    state.events = [e for e in state.events if e.id != target_id]
+    ev = state.get_event(target_id)
+    if ev is None:
+        return
+    idx = state.events.index(ev)
+    state.remove_event_at(idx)
+    _record_removed(_begin_undo(ctx), [(idx, ev)])
 
 
 def set_event_start(
@@ -189,15 +231,15 @@ def set_event_start(
     """
     이벤트의 시작 tick을 직접 지정합니다(드래그/스냅용).
 
-    - undo 스냅샷 저장
+    - undo 기록
     - 프로젝트 범위로 clamp
     """
-    _push_undo_snapshot(state, ctx)
-
-    ev = next((e for e in state.events if e.id == event_id), None)
+    ev = state.get_event(event_id)
     if ev is None:
         return
 
+    ops = _begin_undo(ctx)
+    ops.append(("set", ev.id, {"start_tick": ev.start_tick}))
     ev.start_tick = state.clamp_tick(int(start_tick))
 
 def set_pitch(
@@ -212,8 +254,6 @@ def set_pitch(
     멜로딕 이벤트의 pitch를 변경합니다.
     드럼(type='drum')에는 적용하지 않습니다.
     """
-    _push_undo_snapshot(state, ctx)
-
     target_id = event_id
     if target_id is None:
         if event_ref == "last_selected":
@@ -224,16 +264,20 @@ def set_pitch(
     if not target_id:
         return
 
-    ev = next((e for e in state.events if e.id == target_id), None)
+    ev = state.get_event(target_id)
     if not ev or ev.type != "melodic":
         return
 
+    ops = _begin_undo(ctx)
+    ops.append(("set", ev.id, {"pitch": ev.pitch}))
     ev.pitch = pitch
 
 
 _NOTE_ORDER = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+_NOTE_INDEX = {n: i for i, n in enumerate(_NOTE_ORDER)}
 
 
+@lru_cache(maxsize=512)
 def _parse_pitch(p: str) -> tuple[int, int] | None:
     """
     pitch 예: C4, D#3, A1
@@ -251,15 +295,16 @@ def _parse_pitch(p: str) -> tuple[int, int] | None:
         note = p[:1]
         rest = p[1:]
 
-    if note not in _NOTE_ORDER:
+    note_idx = _NOTE_INDEX.get(note)
+    if note_idx is None:
         return None
 
-    try:
-        octave = int(rest)
-    except:
+    # 숫자가 아니면 예외 없이 바로 None (부호는 한 글자까지 허용)
+    digits = rest[1:] if rest[:1] in ("+", "-") else rest
+    if not digits.isdecimal():
         return None
 
-    return (_NOTE_ORDER.index(note), octave)
+    return (note_idx, int(rest))
 
 
 def _pitch_to_str(note_idx: int, octave: int) -> str:
@@ -271,6 +316,12 @@ def transpose_pitch(pitch: str, semitone: int) -> str | None:
     pitch를 semitone 만큼 이동시킨 새 pitch 문자열 반환.
     실패하면 None.
     """
+    return _transpose_pitch_cached(pitch, int(semitone))
+
+
+@lru_cache(maxsize=1024)
+def _transpose_pitch_cached(pitch: str, semitone: int) -> str | None:
+    # 같은 (pitch, semitone) 조합이 반복되므로 결과 문자열을 캐시
     parsed = _parse_pitch(pitch)
     if not parsed:
         return None
@@ -297,8 +348,6 @@ def transpose_event(
     """
     선택(또는 last_created) 멜로딕 이벤트를 semitone 만큼 transpose 합니다.
     """
-    _push_undo_snapshot(state, ctx)
-
     target_id = event_id
     if target_id is None:
         if event_ref == "last_selected":
@@ -309,12 +358,14 @@ def transpose_event(
     if not target_id:
         return
 
-    ev = next((e for e in state.events if e.id == target_id), None)
+    ev = state.get_event(target_id)
     if not ev or ev.type != "melodic" or not ev.pitch:
         return
 
     new_p = transpose_pitch(ev.pitch, int(semitone))
     if new_p:
+        ops = _begin_undo(ctx)
+        ops.append(("set", ev.id, {"pitch": ev.pitch}))
         ev.pitch = new_p
 
 def toggle_drum_step(
@@ -336,7 +387,7 @@ def toggle_drum_step(
     tolerance_tick: 클릭 오차 허용(0이면 완전 일치)
     반환: "created" | "deleted"
     """
-    _push_undo_snapshot(state, ctx)
+    ops = _begin_undo(ctx)
 
     start_tick = state.clamp_tick(int(start_tick))
     dur = max(1, int(duration_tick))
@@ -356,7 +407,7 @@ def toggle_drum_step(
 
     if idx is not None:
         # 삭제
-        del state.events[idx]
+        _record_removed(ops, [(idx, state.remove_event_at(idx))])
         return "deleted"
 
     # 생성
@@ -371,10 +422,78 @@ def toggle_drum_step(
         velocity=float(velocity),
         pitch=None,
     )
-    state.events.append(ev)
+    state.add_event(ev)
+    ops.append(("del", eid))
     ctx.last_created_event_ids.append(eid)
     return "created"
 
+def _toggle_drum_ticks(
+    state: ProjectState,
+    ctx: ExecContext,
+    ops: list[tuple],
+    *,
+    track_id: int,
+    sample_id: str,
+    ticks: list[int],
+    duration_tick: int = 1,
+    velocity: float = 0.9,
+) -> None:
+    """
+    toggle_drum_step(tolerance_tick=0)을 여러 tick에 한 번에 적용합니다.
+    (undo 기록은 호출한 쪽의 ops에 이어서 쌓음, events는 1번만 스캔)
+    """
+    targets = dict.fromkeys(state.clamp_tick(int(t)) for t in ticks)
+    dur = max(1, int(duration_tick))
+
+    # tick별로 첫 번째로 일치하는 기존 이벤트 -> 삭제 대상
+    found: dict[int, int] = {}
+    for i, e in enumerate(state.events):
+        if (
+            e.start_tick in targets
+            and e.start_tick not in found
+            and e.type == "drum"
+            and e.track_id == track_id
+            and e.sample_id == sample_id
+        ):
+            found[e.start_tick] = i
+
+    if found:
+        drop = set(found.values())
+        _record_removed(ops, [(i, state.events[i]) for i in drop])
+        state.events = [e for i, e in enumerate(state.events) if i not in drop]
+        state.reindex_events()
+
+    created = [
+        Event(
+            id=new_id("e"),
+            track_id=track_id,
+            start_tick=t,
+            duration_tick=dur,
+            type="drum",
+            sample_id=sample_id,
+            velocity=float(velocity),
+            pitch=None,
+        )
+        for t in targets
+        if t not in found
+    ]
+    state.add_events(created)
+    new_ids = [ev.id for ev in created]
+    ops.extend(("del", eid) for eid in new_ids)
+    ctx.last_created_event_ids.extend(new_ids)
+
+
+# 드럼 패턴 정의: pattern -> ((sample_id, 마디 안 tick offset(0-based)), ...)
+_DRUM_PATTERNS: dict[str, tuple[tuple[str, tuple[int, ...]], ...]] = {
+    # 킥: 1,5,9,13 스텝 (4/4, 16분 그리드에서 1박마다)
+    "four_on_the_floor": (("drum_kick_001", (0, 4, 8, 12)),),
+    # 킥 1,9 / 스네어 5,13 스텝
+    "backbeat": (("drum_kick_001", (0, 8)), ("drum_snare_001", (4, 12))),
+    # 하이햇 8분: 1,3,5,...,15 스텝
+    "hihat_8th": (("drum_hat_001", (0, 2, 4, 6, 8, 10, 12, 14)),),
+}
+
+
 def apply_drum_pattern(
     state: ProjectState,
     ctx: ExecContext,
@@ -389,9 +508,9 @@ def apply_drum_pattern(
       - "four_on_the_floor": 킥 1,2,3,4박
       - "backbeat": 스네어 2,4박 + 킥 1,3박
       - "hihat_8th": 하이햇 8분
-    """
-    _push_undo_snapshot(state, ctx)
 
+    각 스텝은 토글(있으면 삭제, 없으면 생성)이며, 패턴 전체가 undo 1번으로 되돌아갑니다.
+    """
     ticks_per_bar = state.meta.ticks_per_bar
     total_bars = state.meta.bars
     bars = max(1, min(int(bars), total_bars))
@@ -401,35 +520,15 @@ def apply_drum_pattern(
     # 드럼 트랙은 1로 고정(지금 프로젝트 기준)
     track_id = 1
 
-    def tick_at(bar_idx: int, step_1based: int) -> int:
-        # "bar:step"의 step을 tick으로 (step_1based: 1..ticks_per_bar)
-        return bar_idx * ticks_per_bar + (step_1based - 1)
-
-    # 패턴 정의(steps는 1-based)
-    if pattern == "four_on_the_floor":
-        # 킥: 1,5,9,13 (4/4, 16분 그리드에서 1박마다)
-        steps = [1, 5, 9, 13]
-        for b in range(start_bar_idx, min(start_bar_idx + bars, total_bars)):
-            for s in steps:
-                toggle_drum_step(state, ctx, track_id=track_id, start_tick=tick_at(b, s), sample_id="drum_kick_001")
-
-    elif pattern == "backbeat":
-        # 킥 1,9 / 스네어 5,13
-        kick_steps = [1, 9]
-        snare_steps = [5, 13]
-        for b in range(start_bar_idx, min(start_bar_idx + bars, total_bars)):
-            for s in kick_steps:
-                toggle_drum_step(state, ctx, track_id=track_id, start_tick=tick_at(b, s), sample_id="drum_kick_001")
-            for s in snare_steps:
-                toggle_drum_step(state, ctx, track_id=track_id, start_tick=tick_at(b, s), sample_id="drum_snare_001")
-
-    elif pattern == "hihat_8th":
-        # 하이햇 8분: 1,3,5,7,9,11,13,15
-        steps = [1, 3, 5, 7, 9, 11, 13, 15]
-        for b in range(start_bar_idx, min(start_bar_idx + bars, total_bars)):
-            for s in steps:
-                toggle_drum_step(state, ctx, track_id=track_id, start_tick=tick_at(b, s), sample_id="drum_hat_001")
-
-    else:
+    layers = _DRUM_PATTERNS.get(pattern)
+    if layers is None:
         # 알 수 없는 패턴이면 아무것도 안 함
         return
+
+    ops = _begin_undo(ctx)
+
+    # tick = bar_idx * ticks_per_bar + offset
+    bar_bases = [b * ticks_per_bar for b in range(start_bar_idx, min(start_bar_idx + bars, total_bars))]
+    for sample_id, offsets in layers:
+        ticks = [base + off for base in bar_bases for off in offsets]
+        _toggle_drum_ticks(state, ctx, ops, track_id=track_id, sample_id=sample_id, ticks=ticks)
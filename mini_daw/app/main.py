@@ -7,8 +7,14 @@ FastAPI 서버 엔트리포인트.
 - API 라우터 등록
 """
 
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
@@ -21,9 +27,53 @@ from fastapi.staticfiles import StaticFiles
 
 from app.api.routes_actions import router as actions_router
 from app.api.routes_meta import router as meta_router
+from app.services import project_cache, render_pool
+from app.services.job_queue import JOBS
+
 
+# 앱 로그(명령 출처 로그 등). 운영에서는 MINI_DAW_LOG_LEVEL=WARNING 으로 끄면 됨
+# 요청 스레드/이벤트 루프는 레코드를 큐에 넣기만 하고, stderr 쓰기는 리스너 스레드가 담당
+# (파이프로 연결된 stderr가 막혀도 요청 처리가 멈추지 않음)
+class _SecondCachedFormatter(logging.Formatter):
+    """
+    asctime 문자열을 초 단위로 캐시하는 Formatter.
 
-app = FastAPI(title="Mini DAW (FastAPI)")
+    같은 초에 찍히는 로그는 strftime을 다시 하지 않고 이전 문자열을 재사용.
+    (리스너 스레드 하나에서만 호출되므로 락 불필요)
+    """
+
+    def __init__(self, fmt: str, datefmt: str):
+        super().__init__(fmt, datefmt=datefmt)
+        self._ts_sec = -1
+        self._ts_str = ""
+
+    def formatTime(self, record, datefmt=None):
+        sec = int(record.created)
+        if sec != self._ts_sec:
+            self._ts_sec = sec
+            self._ts_str = time.strftime(self.datefmt, self.converter(sec))
+        return self._ts_str
+
+
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(
+    _SecondCachedFormatter(
+        "%(asctime)s %(levelname)s %(name)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+)
+_log_enqueue = QueueHandler(_log_queue)
+_log_enqueue.setFormatter(logging.Formatter("%(message)s"))  # 메시지 합치기만, 최종 포맷은 리스너 쪽
+logging.basicConfig(
+    level=os.getenv("MINI_DAW_LOG_LEVEL", "INFO").upper(),
+    handlers=[_log_enqueue],
+)
+_log_listener = QueueListener(_log_queue, _log_stream)
+_log_listener.start()
+
+# 응답 JSON 직렬화는 orjson 사용(state.to_dict() 같은 큰 dict 인코딩이 빠름)
+app = FastAPI(title="Mini DAW (FastAPI)", default_response_class=ORJSONResponse)
 
 
 # 템플릿/정적 파일 연결
@@ -42,6 +92,12 @@ app.include_router(actions_router)
 app.include_router(meta_router)
 
 
+@app.on_event("shutdown")
+async def _flush_pending_saves():
+    """디바운스로 미뤄둔 프로젝트 저장을 종료 전에 모두 기록."""
+    await project_cache.flush_pending()
+
+
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
     """
@@ -51,3 +107,21 @@ def index(request: Request):
     - UI 파일은 사용자가 제공한 ui.html을 index.html로 저장해두면 됩니다. :contentReference[oaicite:1]{index=1}
     """
     return templates.TemplateResponse("index.html", {"request": request})
+
+
+@app.on_event("shutdown")
+def _shutdown_render_pool():
+    """렌더 워커 프로세스 정리."""
+    render_pool.shutdown()
+
+
+@app.on_event("shutdown")
+def _shutdown_job_pool():
+    """대기 중인 job 취소 + job 스레드 풀 정리."""
+    JOBS.shutdown()
+
+
+@app.on_event("shutdown")
+def _stop_log_listener():
+    """큐에 남은 로그를 모두 출력하고 리스너 스레드 종료(마지막 shutdown 훅)."""
+    _log_listener.stop()
@@ -2,7 +2,7 @@
 job_queue.py
 
 아주 단순한 Job(백그라운드 작업) 실행/진행률 저장 시스템.
-Step4에서는 Redis/Celery 없이 "메모리 딕셔너리 + 백그라운드 스레드"로 구현합니다.
+Step4에서는 Redis/Celery 없이 "메모리 딕셔너리 + 백그라운드 스레드 풀"로 구현합니다.
 
 장점:
 - 구현이 간단하고 동작 확인이 쉬움
@@ -15,12 +15,19 @@ Step4에서는 Redis/Celery 없이 "메모리 딕셔너리 + 백그라운드 스
 
 from __future__ import annotations
 
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Callable, Any, Optional
-from threading import Thread, Lock
+from threading import Lock
 import time
 import uuid
 
+# 동시에 실행되는 job 수(넘치면 queued 상태로 대기)
+# 렌더는 render_pool 프로세스에서 돌고 job 스레드는 기다리기만 하므로 CPU 수 정도면 충분
+MAX_JOB_WORKERS = os.cpu_count() or 4
+
 
 def new_job_id() -> str:
     return f"job_{uuid.uuid4().hex[:12]}"
@@ -45,6 +52,24 @@ class Job:
     result: Optional[dict[str, Any]] = None
     error: Optional[str] = None
     created_at: float = field(default_factory=time.time)
+    # 이 job의 상태/구독자 목록 보호용(진행률 갱신이 다른 job과 서로 막지 않도록 job마다 따로)
+    _lock: Lock = field(default_factory=Lock, repr=False, compare=False)
+    # [(loop, queue), ...] 진행률 push 구독자
+    _subscribers: list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = field(
+        default_factory=list, repr=False, compare=False
+    )
+
+    def to_dict(self) -> dict[str, Any]:
+        """API 응답/진행률 이벤트용 스냅샷."""
+        return {
+            "id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+        }
 
 
 class JobQueue:
@@ -54,15 +79,25 @@ class JobQueue:
     사용법:
         job_id = JOBS.create("render_preview", fn=callable, args=..., kwargs=...)
         GET /api/jobs/{job_id} 로 상태 조회
+        GET /api/jobs/{job_id}/events 로 진행률 push(SSE) 구독
+
+    진행률 push:
+    - subscribe()가 돌려준 asyncio.Queue에 상태가 바뀔 때마다 스냅샷(dict)이 들어옵니다.
+    - job은 스레드에서 돌기 때문에 loop.call_soon_threadsafe로 이벤트 루프에 넘김
+
+    락:
+    - job 상태 변경/구독은 job별 락(Job._lock)만 잡습니다.
+    - _jobs 딕셔너리는 등록할 때만 큐 락을 잡고, 조회는 락 없이 dict.get(GIL로 키 단위 원자적).
     """
 
     def __init__(self) -> None:
         self._jobs: dict[str, Job] = {}
         self._lock = Lock()
+        # job마다 스레드를 새로 만들지 않고 워커 스레드를 재사용
+        self._pool = ThreadPoolExecutor(max_workers=MAX_JOB_WORKERS, thread_name_prefix="job")
 
     def get(self, job_id: str) -> Optional[Job]:
-        with self._lock:
-            return self._jobs.get(job_id)
+        return self._jobs.get(job_id)
 
     def create(self, job_type: str, fn: Callable[..., dict[str, Any]], *args, **kwargs) -> str:
         job_id = new_job_id()
@@ -71,47 +106,96 @@ class JobQueue:
         with self._lock:
             self._jobs[job_id] = job
 
-        # 백그라운드 스레드로 실행
-        t = Thread(target=self._run_job, args=(job_id, fn, args, kwargs), daemon=True)
-        t.start()
+        # 백그라운드 스레드 풀에서 실행
+        self._pool.submit(self._run_job, job_id, fn, args, kwargs)
         return job_id
 
+    def shutdown(self) -> None:
+        """아직 시작 안 한 job은 취소하고 풀 종료(서버 종료 시 호출, 실행 중인 job은 기다리지 않음)."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def subscribe(self, job_id: str) -> Optional[asyncio.Queue]:
+        """
+        job 상태 변경 알림 구독(이벤트 루프 안에서 호출).
+        job이 없으면 None. 다 쓰면 unsubscribe() 필수.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        q: asyncio.Queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with job._lock:
+            job._subscribers.append((loop, q))
+        return q
+
+    def unsubscribe(self, job_id: str, q: asyncio.Queue) -> None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        with job._lock:
+            job._subscribers[:] = [(lp, sq) for (lp, sq) in job._subscribers if sq is not q]
+
+    @staticmethod
+    def _snapshot_subs(job: Job) -> tuple[dict[str, Any], list]:
+        # job._lock 잡은 상태에서 호출
+        return job.to_dict(), list(job._subscribers)
+
+    @staticmethod
+    def _publish(snap: dict[str, Any], subs: list) -> None:
+        # 락 밖에서 호출(구독자 루프로 전달만 하고 바로 반환)
+        for loop, q in subs:
+            try:
+                loop.call_soon_threadsafe(q.put_nowait, snap)
+            except RuntimeError:
+                # 루프가 이미 닫힘(클라이언트 종료 등)
+                pass
+
     def update(self, job_id: str, *, progress: int | None = None, message: str | None = None) -> None:
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
-                return
+        job = self._jobs.get(job_id)
+        if not job:
+            return
+        with job._lock:
+            before = (job.progress, job.message)
             if progress is not None:
                 job.progress = max(0, min(int(progress), 100))
             if message is not None:
                 job.message = message
+            if (job.progress, job.message) == before:
+                # 바뀐 게 없으면 구독자에게 보내지 않음
+                return
+            snap, subs = self._snapshot_subs(job)
+        self._publish(snap, subs)
 
     def _run_job(self, job_id: str, fn: Callable[..., dict[str, Any]], args: tuple, kwargs: dict) -> None:
         # running으로 전환
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
-                return
+        job = self._jobs.get(job_id)
+        if not job:
+            return
+        with job._lock:
             job.status = "running"
             job.progress = 1
             job.message = "running"
+            snap, subs = self._snapshot_subs(job)
+        self._publish(snap, subs)
 
         try:
             result = fn(job_id, *args, **kwargs)
 
-            with self._lock:
-                job = self._jobs[job_id]
+            with job._lock:
                 job.status = "done"
                 job.progress = 100
                 job.message = "done"
                 job.result = result
+                snap, subs = self._snapshot_subs(job)
+            self._publish(snap, subs)
 
         except Exception as e:
-            with self._lock:
-                job = self._jobs[job_id]
+            with job._lock:
                 job.status = "failed"
                 job.message = "failed"
                 job.error = str(e)
+                snap, subs = self._snapshot_subs(job)
+            self._publish(snap, subs)
 
 
 # 전역 큐(간단 MVP용)
@@ -11,80 +11,316 @@ Step2에서는 진짜 LLM 대신 "더미 플래너"를 넣습니다.
 
 from __future__ import annotations
 
+import copy
 import json
+import logging
 import re
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
 from typing import Optional
+
+import orjson
+
+from app.config import CONFIG
 from app.core.plan_schema import Plan, PlanAction
-import torch
 
-RE_TIME = re.compile(r"^\d+:\d+$")          # "bar:step"
-RE_PITCH = re.compile(r"^[A-G]#?\d+$")      # "A1", "C#4"
-RE_INT = re.compile(r"^[+-]?\d+$")
+# 룰 명령 문법(소문자로 정규화된 메시지에 match). 그룹을 바로 인자로 씀
+RE_UNDO = re.compile(r"undo\S*(?:\s+(\d+)(?!\S))?")                   # "undo", "undo 3"
+RE_PLACE_BASS = re.compile(r"place\s+bass\s+([a-g]#?\d+)\s+(\d+:\d+)$")  # "place bass a1 1:1"
+RE_MOVE_SEL = re.compile(r"move selected(?:\D*?([+-]?\d+))?")          # "move selected +4"
+RE_DELETE_SEL = re.compile(r"delete selected")
+RE_SET_PITCH = re.compile(r"set pitch\S*(?:\s+([a-g]#?\d+)(?!\S)|$)")  # "set pitch c4"(생략하면 C4)
+RE_TRANSPOSE = re.compile(r"transpose(?:\D*?([+-]?\d+))?")             # "transpose -2"
+RE_SIGNED_INT = re.compile(r"([+-]?\d+)")   # "move selected +4"의 +4 등
+RE_UNDO_COUNT = re.compile(r"(\d+)\s*번")   # "2번 되돌려줘"
+RE_UNDO_HINT = re.compile(r"되돌|뒤로|취소|되감")  # 메시지의 undo 의도 키워드(한 번의 스캔으로 검사)
+
+# 같은 프롬프트(메시지 + state_hint)에 대한 LLM 원문 출력 캐시 크기
+LLM_CACHE_SIZE = 256
+# plan JSON 생성 최대 토큰 수
+LLM_MAX_NEW_TOKENS = 512
+# static KV 캐시 길이 = SYS_PROMPT 토큰 + 이만큼(user 프롬프트 여유) + LLM_MAX_NEW_TOKENS
+STATIC_CACHE_USER_TOKENS = 512
+
+logger = logging.getLogger(__name__)
+
+# model_name -> (tokenizer, model). 플래너 인스턴스가 여러 개여도 가중치는 한 번만 로드
+_MODELS: dict[str, tuple] = {}
+_MODELS_LOCK = Lock()
+
+
+@lru_cache(maxsize=32)
+def _hint_json_cached(items: tuple) -> str:
+    return json.dumps(dict(items), ensure_ascii=False)
+
+
+def _hint_json(state_hint: dict) -> str:
+    """
+    state_hint의 JSON 문자열. 메타가 그대로면 같은 문자열을 재사용합니다
+    (프롬프트 문자열도 그대로라 LLM 출력 캐시에도 그대로 맞음).
+    값이 해시 불가(중첩 dict 등)면 그냥 매번 인코딩.
+    """
+    try:
+        return _hint_json_cached(tuple(state_hint.items()))
+    except TypeError:
+        return json.dumps(state_hint, ensure_ascii=False)
+
+
+class _JsonCloseStop:
+    """
+    생성 중인 토큰에서 중괄호 균형을 세다가, 첫 '{' 이후 균형이 0으로 돌아오면(JSON 객체가 닫히면) 생성 중단.
+    plan JSON은 보통 짧은데 max_new_tokens까지 계속 디코딩하지 않도록 합니다.
+    (생성 1번마다 새로 만들어 써야 함, batch=1 기준)
+    """
+
+    def __init__(self, tokenizer) -> None:
+        self._tok = tokenizer
+        self._depth = 0
+        self._opened = False
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        # 마지막으로 생성된 토큰만 디코딩
+        text = self._tok.decode(input_ids[0, -1:], skip_special_tokens=True)
+        for ch in text:
+            if ch == "{":
+                self._depth += 1
+                self._opened = True
+            elif ch == "}" and self._opened:
+                self._depth -= 1
+        done = self._opened and self._depth <= 0
+        return torch.full((input_ids.shape[0],), done, dtype=torch.bool, device=input_ids.device)
+
+
+# bitsandbytes로 양자화하는 llm_quant 값
+_BNB_QUANTS = frozenset({"int8", "int4"})
+
+
+def _model_load_kwargs(quant: str) -> dict:
+    """
+    from_pretrained 인자(장치/정밀도).
+    디코딩은 가중치를 매 스텝 다시 읽는 메모리 대역폭 병목이라 가중치를 작게 할수록 빨라집니다.
+
+    - fp16(기본): CUDA, float16
+    - bf16: CUDA, bfloat16
+    - int8: bitsandbytes 8bit 양자화(CUDA, bitsandbytes 설치 필요)
+    - int4: bitsandbytes 4bit NF4 양자화(연산은 fp16, VRAM/대역폭 약 1/4)
+    - CUDA가 없으면 설정과 상관없이 CPU + bfloat16(fp32 대비 대역폭 절반)
+    """
+    import torch
+
+    if not torch.cuda.is_available():
+        return {"device_map": "cpu", "torch_dtype": torch.bfloat16}
+    if quant in _BNB_QUANTS:
+        from transformers import BitsAndBytesConfig
+
+        if quant == "int4":
+            bnb = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_compute_dtype=torch.float16,
+            )
+        else:
+            bnb = BitsAndBytesConfig(load_in_8bit=True)
+        return {"device_map": "auto", "quantization_config": bnb}
+    if quant == "bf16":
+        return {"device_map": "cuda", "torch_dtype": torch.bfloat16}
+    return {"device_map": "cuda", "torch_dtype": torch.float16}
+
+
+def _kv_cache_kwargs(kv_quant: str) -> dict:
+    """
+    KV 캐시 양자화용 generate 인자(llm_kv_quant).
+    시스템 프롬프트가 길어서 디코딩 스텝마다 KV 캐시 읽기가 대역폭의 큰 부분 → 캐시를 작게.
+    최근 토큰(residual_length)은 원래 정밀도로 두고 그 앞부분만 양자화됨.
+
+    - none(기본): 양자화 안 함
+    - int4: quanto 백엔드 4bit(optimum-quanto 필요)
+    - int8: HQQ 백엔드 8bit(hqq 필요)
+    """
+    if kv_quant == "int4":
+        return {"cache_implementation": "quantized", "cache_config": {"backend": "quanto", "nbits": 4}}
+    if kv_quant == "int8":
+        return {"cache_implementation": "quantized", "cache_config": {"backend": "HQQ", "nbits": 8}}
+    return {}
+
+
+def _compile_attention(mdl, fullgraph: bool):
+    """
+    디코더 레이어마다 self_attn만 따로 컴파일합니다(MLP 등 나머지는 eager).
+    forward 전체보다 컴파일 시간이 훨씬 짧고, attention 안의 작은 커널들(q/k/v proj, norm, rotary)은
+    inductor combo_kernels로 가로로 묶여 레이어당 커널 수가 줄어듦.
+    되돌리는 함수를 반환.
+    """
+    import torch
+    import torch._inductor.config as inductor_config
+
+    # combo_kernels가 없는 torch 버전이면 그냥 레이어별 컴파일만
+    for key in ("combo_kernels", "benchmark_combo_kernel"):
+        if hasattr(inductor_config.triton, key):
+            setattr(inductor_config.triton, key, True)
+
+    layers = mdl.model.layers
+    orig_attns = [layer.self_attn for layer in layers]
+    for layer in layers:
+        layer.self_attn = torch.compile(layer.self_attn, mode="reduce-overhead", dynamic=False, fullgraph=fullgraph)
+
+    def restore() -> None:
+        for layer, attn in zip(layers, orig_attns):
+            layer.self_attn = attn
+
+    return restore
+
+
+def _compile_model(tok, mdl, scope: str) -> None:
+    """
+    디코딩을 torch.compile(reduce-overhead = CUDA graph)로 감쌉니다.
+    토큰 1개마다 커널 launch/파이썬 디스패치 비용이 크기 때문에 단일 요청 디코딩에서 효과가 큼.
+    - scope: "1"이면 forward 전체, "attn"이면 레이어별 self_attn만(_compile_attention)
+    - KV 캐시는 static(모양 고정이어야 CUDA graph 재사용 가능)
+    - bitsandbytes(int8/int4)는 그래프가 끊기므로 fullgraph=False
+    - 로드 시 짧게 한 번 생성해서 컴파일을 미리 끝냄. 실패하면 eager로 되돌림
+    """
+    import torch
+
+    if not torch.cuda.is_available():
+        return
+
+    fullgraph = CONFIG.llm_quant not in _BNB_QUANTS
+    mdl.generation_config.cache_implementation = "static"
+    if scope == "attn":
+        restore = _compile_attention(mdl, fullgraph)
+    else:
+        orig_forward = mdl.forward
+        mdl.forward = torch.compile(orig_forward, mode="reduce-overhead", fullgraph=fullgraph)
+
+        def restore() -> None:
+            mdl.forward = orig_forward
+
+    try:
+        warm = tok("warmup", return_tensors="pt").to(mdl.device)
+        mdl.generate(**warm, max_new_tokens=4, do_sample=False)
+    except Exception:
+        logger.exception("torch.compile warmup failed; using eager forward")
+        restore()
+        mdl.generation_config.cache_implementation = None
+
+
+def _make_static_cache(mdl, max_cache_len: int):
+    """
+    요청마다 재사용할 StaticCache(batch=1, 길이 고정).
+    길이가 요청마다 바뀌지 않아야 컴파일된 CUDA graph를 다시 캡처하지 않고 재생만 함.
+    transformers 버전에 따라 생성자가 달라 실패하면 None(generate가 알아서 static 캐시를 만듦).
+    """
+    try:
+        from transformers import StaticCache
+
+        return StaticCache(
+            config=mdl.config,
+            max_batch_size=1,
+            max_cache_len=max_cache_len,
+            device=mdl.device,
+            dtype=mdl.dtype,
+        )
+    except Exception:
+        logger.exception("StaticCache setup failed; generate will allocate its own")
+        return None
+
+
+def _load_model(model_name: str) -> tuple:
+    with _MODELS_LOCK:
+        hit = _MODELS.get(model_name)
+        if hit is not None:
+            return hit
+
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+
+        tok = AutoTokenizer.from_pretrained(model_name)
+        mdl = AutoModelForCausalLM.from_pretrained(model_name, **_model_load_kwargs(CONFIG.llm_quant))
+        if CONFIG.llm_compile in ("1", "attn"):
+            _compile_model(tok, mdl, CONFIG.llm_compile)
+        _MODELS[model_name] = (tok, mdl)
+        return tok, mdl
 
 # ------------------------
 # 1) 특수 명령(룰 기반)
 # ------------------------
+# 가장 자주 오는 두 명령("undo", "pattern four")은 결과가 항상 같으므로 한 번만 만들어 둠
+# (rule_first_plan의 반환값과 마찬가지로 읽기 전용)
+_UNDO_PLAN = Plan.model_construct(summary="rule: undo", actions=[
+    PlanAction.model_construct(tool="undo", args={"steps": 1})
+])
+_PATTERN_FOUR_PLAN = Plan.model_construct(summary="rule: pattern four", actions=[
+    PlanAction.model_construct(tool="apply_pattern_four", args={"track_id": 1, "drum": "kick", "velocity": 0.95, "overwrite": False})
+])
+
+
 def rule_first_plan(message: str) -> Plan | None:
-    m = message.strip()
-    low = m.lower()
+    """
+    룰로 처리 가능한 명령이면 Plan, 아니면 None.
 
+    같은 명령("undo", "pattern four" 등)이 반복해서 들어오므로 정규화한 메시지 기준으로 캐시합니다.
+    반환된 Plan은 캐시에 있는 객체라 읽기 전용으로 사용(실행/model_dump만).
+    """
+    return _rule_plan(message.strip().lower())
+
+
+@lru_cache(maxsize=512)
+def _rule_plan(low: str) -> Plan | None:
+    # 룰이 만든 값은 이미 스키마에 맞으므로 검증 없이 model_construct로 생성
+    # (검증은 신뢰할 수 없는 LLM 출력에만: GemmaPlanner.make_plan의 model_validate)
     # 1) undo
-    if low.startswith("undo"):
-        parts = low.split()
-        steps = 1
-        if len(parts) >= 2 and parts[1].isdigit():
-            steps = int(parts[1])
-        return Plan(summary="rule: undo", actions=[
-            PlanAction(tool="undo", args={"steps": steps})
+    m = RE_UNDO.match(low)
+    if m:
+        steps = int(m.group(1) or 1)
+        if steps == 1:
+            return _UNDO_PLAN
+        return Plan.model_construct(summary="rule: undo", actions=[
+            PlanAction.model_construct(tool="undo", args={"steps": steps})
         ])
 
     # 2) pattern four
     if low in ("pattern four", "pattern 4", "four"):
-        return Plan(summary="rule: pattern four", actions=[
-            PlanAction(tool="apply_pattern_four", args={"track_id": 1, "drum": "kick", "velocity": 0.95, "overwrite": False})
-        ])
+        return _PATTERN_FOUR_PLAN
 
     # 3) place bass A1 1:1  (일단 bass만 확정 지원)
     #    필요하면 pad/lead도 같은 방식으로 확장 가능
-    parts = low.split()
-    if len(parts) == 4 and parts[0] == "place" and parts[1] == "bass":
-        pitch = parts[2].upper()
-        start = parts[3]
-        if RE_PITCH.match(pitch) and RE_TIME.match(start):
-            return Plan(summary="rule: place bass", actions=[
-                PlanAction(tool="place_note", args={
-                    "track_id": 2, "start": start, "duration_tick": 4, "pitch": pitch
-                })
-            ])
+    m = RE_PLACE_BASS.match(low)
+    if m:
+        return Plan.model_construct(summary="rule: place bass", actions=[
+            PlanAction.model_construct(tool="place_note", args={
+                "track_id": 2, "start": m.group(2), "duration_tick": 4, "pitch": m.group(1).upper()
+            })
+        ])
 
     # 4) move selected +4 / delete selected
-    if low.startswith("move selected"):
-        mm = re.search(r"([+-]?\d+)", low)
-        delta = int(mm.group(1)) if mm else 1
-        return Plan(summary="rule: move selected", actions=[
-            PlanAction(tool="move_event", args={"event_ref": "last_selected", "delta_tick": delta})
+    m = RE_MOVE_SEL.match(low)
+    if m:
+        delta = int(m.group(1)) if m.group(1) else 1
+        return Plan.model_construct(summary="rule: move selected", actions=[
+            PlanAction.model_construct(tool="move_event", args={"event_ref": "last_selected", "delta_tick": delta})
         ])
 
-    if low.startswith("delete selected"):
-        return Plan(summary="rule: delete selected", actions=[
-            PlanAction(tool="delete_event", args={"event_ref": "last_selected"})
+    if RE_DELETE_SEL.match(low):
+        return Plan.model_construct(summary="rule: delete selected", actions=[
+            PlanAction.model_construct(tool="delete_event", args={"event_ref": "last_selected"})
         ])
 
     # 5) set pitch C4
-    if low.startswith("set pitch"):
-        p = low.split()
-        pitch = p[2].upper() if len(p) >= 3 else "C4"
-        if RE_PITCH.match(pitch):
-            return Plan(summary="rule: set pitch", actions=[
-                PlanAction(tool="set_pitch", args={"event_ref": "last_selected", "pitch": pitch})
-            ])
+    m = RE_SET_PITCH.match(low)
+    if m:
+        return Plan.model_construct(summary="rule: set pitch", actions=[
+            PlanAction.model_construct(tool="set_pitch", args={"event_ref": "last_selected", "pitch": (m.group(1) or "c4").upper()})
+        ])
 
     # 6) transpose +2
-    if low.startswith("transpose"):
-        mm = re.search(r"([+-]?\d+)", low)
-        semi = int(mm.group(1)) if mm else 0
-        return Plan(summary="rule: transpose", actions=[
-            PlanAction(tool="transpose_event", args={"event_ref": "last_selected", "semitone": semi})
+    m = RE_TRANSPOSE.match(low)
+    if m:
+        semi = int(m.group(1)) if m.group(1) else 0
+        return Plan.model_construct(summary="rule: transpose", actions=[
+            PlanAction.model_construct(tool="transpose_event", args={"event_ref": "last_selected", "semitone": semi})
         ])
 
     return None
@@ -107,53 +343,8 @@ def rule_first_plan(message: str) -> Plan | None:
 # ------------------------
 # 2) Gemma 플래너
 # ------------------------
-class GemmaPlanner:
-    """
-    Gemma-2B-IT로 Plan(JSON) 생성하는 플래너.
-
-    출력은 반드시 다음 형태의 JSON만 반환하도록 프롬프트를 강하게 줍니다:
-    {
-      "summary": "...",
-      "actions": [{"tool":"...", "args": {...}}, ...],
-      "assumptions": []
-    }
-    """
-
-    def __init__(self, model_name: str = "google/gemma-2-2b-it"):
-        self.model_name = model_name
-        self._pipe = None
-
-    def _lazy_load(self):
-        if self._pipe is not None:
-            return
-
-        from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-
-        tok = AutoTokenizer.from_pretrained(self.model_name)
-        mdl = AutoModelForCausalLM.from_pretrained(
-            self.model_name,
-            device_map="cuda",
-            torch_dtype=torch.float16,
-        )
-        self._pipe = pipeline(
-            "text-generation",
-            model=mdl,
-            tokenizer=tok,
-            max_new_tokens=512,
-            do_sample=False,
-            return_full_text=False,
-        )
-
-    def make_plan(self, message: str, state_hint: dict | None = None) -> Plan:
-        # 룰 우선
-        p = rule_first_plan(message)
-        if p:
-            return p
-
-        self._lazy_load()
-
-        state_hint = state_hint or {}
-        sys = """
+# 플래너 시스템 프롬프트(요청마다 같음 → 토큰/KV 캐시를 한 번만 계산해서 재사용)
+SYS_PROMPT = """
             You are a music DAW command planner.
 
             OUTPUT FORMAT (STRICT):
@@ -255,6 +446,83 @@ class GemmaPlanner:
             NOW, given the user's message, output ONLY the JSON plan.
             """
 
+
+class GemmaPlanner:
+    """
+    Gemma-2B-IT로 Plan(JSON) 생성하는 플래너.
+
+    출력은 반드시 다음 형태의 JSON만 반환하도록 프롬프트를 강하게 줍니다:
+    {
+      "summary": "...",
+      "actions": [{"tool":"...", "args": {...}}, ...],
+      "assumptions": []
+    }
+    """
+
+    def __init__(self, model_name: str = "google/gemma-2-2b-it"):
+        self.model_name = model_name
+        self._tok = None
+        self._mdl = None
+        # SYS_PROMPT 토큰 + 그 KV 캐시(prefix). 요청마다 시스템 프롬프트 prefill을 다시 하지 않도록
+        self._sys_ids = None
+        self._sys_past = None
+        # torch.compile 모드에서 요청마다 reset해서 쓰는 고정 길이 StaticCache
+        self._static_cache = None
+        # KV 캐시 양자화 generate 인자(_kv_cache_kwargs)
+        self._kv_kwargs: dict = {}
+        # 첫 요청이 동시에 들어와도 모델을 두 번 로드하지 않도록
+        self._load_lock = Lock()
+        # 모델 generate / prefix KV / StaticCache / 출력 캐시는 동시 호출에 안전하지 않으므로 LLM 실행을 직렬화
+        # (프로세스 공용 인스턴스라 채팅 라우트, parse_with_llm 등 모든 호출자가 이 락을 거침)
+        self._gen_lock = Lock()
+        # user 프롬프트 -> generated_text (SYS_PROMPT는 고정, do_sample=False라 같은 프롬프트면 출력도 같음)
+        self._llm_cache: OrderedDict[str, str] = OrderedDict()
+
+    def _lazy_load(self):
+        if self._mdl is not None:
+            return
+
+        with self._load_lock:
+            if self._mdl is not None:
+                return
+
+            import torch
+
+            tok, mdl = _load_model(self.model_name)
+            # 모델을 (다시) 로드하면 이전 출력 캐시는 버림
+            self._llm_cache.clear()
+            self._tok = tok
+            self._mdl = mdl
+
+            self._sys_ids = tok(SYS_PROMPT + "\n", return_tensors="pt").input_ids.to(mdl.device)
+            self._sys_past = None
+            self._static_cache = None
+            self._kv_kwargs = {}
+            # static KV 캐시(torch.compile 모드)나 양자화 KV 캐시는 prefix 재사용이 안 되므로 그때는 매번 전체 prefill
+            if getattr(mdl.generation_config, "cache_implementation", None) == "static":
+                self._static_cache = _make_static_cache(
+                    mdl, self._sys_ids.shape[1] + STATIC_CACHE_USER_TOKENS + LLM_MAX_NEW_TOKENS
+                )
+            elif CONFIG.llm_kv_quant != "none":
+                self._kv_kwargs = _kv_cache_kwargs(CONFIG.llm_kv_quant)
+            else:
+                with torch.no_grad():
+                    self._sys_past = mdl(self._sys_ids, use_cache=True).past_key_values
+
+    def make_plan(self, message: str, state_hint: dict | None = None) -> Plan:
+        # 룰 우선
+        p = rule_first_plan(message)
+        if p:
+            return p
+
+        # 룰 전용 배포/테스트: torch/transformers를 import하지도, 모델을 올리지도 않음
+        if not CONFIG.llm_enabled:
+            return Plan(summary="LLM disabled", actions=[], assumptions=["llm_disabled"])
+
+        self._lazy_load()
+
+        state_hint = state_hint or {}
+
         # sys = (
         #     "You are a music DAW command planner.\n"
         #     "Return ONLY valid JSON for a plan with keys: summary, actions, assumptions.\n"
@@ -282,21 +550,22 @@ class GemmaPlanner:
 
         user = (
             f"User command: {message}\n"
-            f"State hint: {json.dumps(state_hint, ensure_ascii=False)}\n"
+            f"State hint: {_hint_json(state_hint)}\n"
             "Return JSON only. Do not use markdown fences.\n"
         )
 
-        out = self._pipe(f"{sys}\n{user}")[0]["generated_text"]
+        with self._gen_lock:
+            out = self._run_llm(user)
 
-        print("\n===== [LLM RAW OUTPUT] =====")
-        print(out)
-        print("===== [END RAW OUTPUT] =====\n")
+        # 디버그 출력은 DEBUG 레벨일 때만(운영에서는 문자열을 만들지도 않음)
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("LLM raw output:\n%s", out)
 
         plan_json = self._extract_json(out)
 
-        print("===== [EXTRACTED PLAN_JSON] =====")
-        print(plan_json)
-        print("===== [END PLAN_JSON] =====\n")
+        if debug:
+            logger.debug("extracted plan_json: %s", plan_json)
 
         if plan_json is None:
             return Plan(summary="LLM parse failed", actions=[], assumptions=["parse_failed"])
@@ -304,18 +573,94 @@ class GemmaPlanner:
         # ✅ 여기서 보정(repair) 추가
         plan_json = self._repair_plan_json(plan_json, message)
 
-        print("===== [REPAIRED PLAN_JSON] =====")
-        print(plan_json)
-        print("===== [END REPAIRED PLAN_JSON] =====\n")
+        if debug:
+            logger.debug("repaired plan_json: %s", plan_json)
 
         try:
             return Plan.model_validate(plan_json)
         except Exception as e:
-            print("!!!!! [PLAN VALIDATION ERROR] !!!!!")
-            print(e)
+            logger.warning("LLM plan validation error: %s", e)
             return Plan(summary="LLM schema invalid", actions=[], assumptions=["schema_invalid"])
 
         
+    def _run_llm(self, user: str) -> str:
+        """
+        LLM 실행(SYS_PROMPT + user 프롬프트, 생성된 부분의 텍스트 원문 반환).
+        HF pipeline 없이 tokenizer + model.generate를 직접 호출합니다(요청마다 pipeline 전처리/후처리 생략).
+        시스템 프롬프트 부분은 _lazy_load에서 계산한 KV 캐시를 복사해서 이어서 생성합니다.
+        torch.compile 모드에서는 대신 고정 길이 StaticCache 하나를 reset해서 재사용하고,
+        KV 캐시 양자화(llm_kv_quant)를 켜면 양자화 캐시로 매번 전체 prefill합니다.
+        같은 메시지를 반복해서 보내는 경우가 많아서 최근 LLM_CACHE_SIZE개 프롬프트의 출력을 재사용합니다.
+        (JSON 추출/보정/검증은 캐시 밖에서 매번 수행)
+        """
+        out = self._llm_cache.get(user)
+        if out is not None:
+            self._llm_cache.move_to_end(user)
+            return out
+
+        import torch
+        from transformers import StoppingCriteriaList
+
+        tok, mdl = self._tok, self._mdl
+        user_ids = tok(user, add_special_tokens=False, return_tensors="pt").input_ids.to(mdl.device)
+        input_ids = torch.cat([self._sys_ids, user_ids], dim=1)
+        gen_kwargs = dict(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=LLM_MAX_NEW_TOKENS,
+            do_sample=False,
+            use_cache=True,
+            pad_token_id=tok.eos_token_id,
+        )
+
+        gen = None
+        if self._sys_past is not None:
+            try:
+                # generate가 캐시를 제자리에서 늘리므로 매번 복사본을 넘김
+                gen = mdl.generate(
+                    **gen_kwargs,
+                    past_key_values=copy.deepcopy(self._sys_past),
+                    stopping_criteria=StoppingCriteriaList([_JsonCloseStop(tok)]),
+                )
+            except Exception:
+                # 모델/transformers 버전에 따라 prefix 캐시를 못 받는 경우 → 이후로는 사용 안 함
+                logger.exception("system prompt KV cache reuse failed; disabling prefix cache")
+                self._sys_past = None
+        cache = self._static_cache
+        if gen is None and cache is not None and input_ids.shape[1] + LLM_MAX_NEW_TOKENS <= cache.max_cache_len:
+            try:
+                # 같은 캐시 텐서를 제자리에서 비우고 재사용(주소/모양이 그대로라 CUDA graph 재생 가능)
+                cache.reset()
+                gen = mdl.generate(
+                    **gen_kwargs,
+                    past_key_values=cache,
+                    cache_implementation=None,
+                    stopping_criteria=StoppingCriteriaList([_JsonCloseStop(tok)]),
+                )
+            except Exception:
+                logger.exception("static KV cache reuse failed; letting generate allocate its own")
+                self._static_cache = None
+        if gen is None and self._kv_kwargs:
+            try:
+                gen = mdl.generate(
+                    **gen_kwargs,
+                    **self._kv_kwargs,
+                    stopping_criteria=StoppingCriteriaList([_JsonCloseStop(tok)]),
+                )
+            except Exception:
+                # 백엔드 패키지(quanto/hqq)가 없는 경우 등 → 이후로는 일반 KV 캐시
+                logger.exception("quantized KV cache failed; using full precision cache")
+                self._kv_kwargs = {}
+        if gen is None:
+            gen = mdl.generate(**gen_kwargs, stopping_criteria=StoppingCriteriaList([_JsonCloseStop(tok)]))
+
+        # 프롬프트 부분은 빼고 새로 생성된 토큰만 디코딩
+        out = tok.decode(gen[0, input_ids.shape[1]:], skip_special_tokens=True)
+        self._llm_cache[user] = out
+        while len(self._llm_cache) > LLM_CACHE_SIZE:
+            self._llm_cache.popitem(last=False)
+        return out
+
     def _repair_plan_json(self, plan_json: dict, message: str) -> dict:
         # 1) assumptions: dict -> list 로 보정
         if isinstance(plan_json.get("assumptions"), dict):
@@ -333,19 +678,12 @@ class GemmaPlanner:
         msg = message.strip().lower()
         summ = plan_json["summary"].lower()
 
-        undo_intent = (
-            "undo" in summ
-            or "되돌" in msg
-            or "뒤로" in msg
-            or "취소" in msg
-            or "되감" in msg
-        )
+        undo_intent = "undo" in summ or RE_UNDO_HINT.search(msg) is not None
 
         if undo_intent and len(plan_json["actions"]) == 0:
             # "2번" 같은 횟수 파싱(없으면 1)
-            import re
             steps = 1
-            m = re.search(r"(\d+)\s*번", msg)
+            m = RE_UNDO_COUNT.search(msg)
             if m:
                 steps = int(m.group(1))
             elif "두" in msg:
@@ -363,24 +701,46 @@ class GemmaPlanner:
     @staticmethod
     def _extract_json(text: str) -> Optional[dict]:
         # 1) ```json ... ``` 코드펜스 우선 추출
-        m = re.search(r"```json\s*([\s\S]*?)\s*```", text, re.IGNORECASE)
-        if m:
-            candidate = m.group(1).strip()
-            try:
-                return json.loads(candidate)
-            except Exception:
-                pass
-
-        # 2) 일반 { ... } 블록 추출(가장 바깥 JSON)
-        m = re.search(r"\{[\s\S]*\}", text)
-        if not m:
+        fence = text.lower().find("```json")
+        if fence != -1:
+            body_start = fence + len("```json")
+            body_end = text.find("```", body_start)
+            if body_end != -1:
+                try:
+                    return orjson.loads(text[body_start:body_end].strip())
+                except Exception:
+                    pass
+
+        # 2) 첫 '{'부터 중괄호 균형이 맞는 곳까지(문자열 안의 괄호/이스케이프는 무시) 한 번만 훑어서 추출
+        start = text.find("{")
+        if start == -1:
             return None
 
-        candidate = m.group(0).strip()
-        try:
-            return json.loads(candidate)
-        except Exception:
-            return None
+        depth = 0
+        in_str = False
+        escaped = False
+        for i in range(start, len(text)):
+            c = text[i]
+            if in_str:
+                if escaped:
+                    escaped = False
+                elif c == "\\":
+                    escaped = True
+                elif c == '"':
+                    in_str = False
+            elif c == '"':
+                in_str = True
+            elif c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+                if depth == 0:
+                    try:
+                        return orjson.loads(text[start : i + 1])
+                    except Exception:
+                        return None
+        return None
+
     # def _extract_json(text: str) -> Optional[dict]:
     #     # 가장 단순한 JSON 객체 추출
     #     start = text.find("{")
@@ -394,6 +754,20 @@ class GemmaPlanner:
     #         return None
 
 
+_PLANNER: Optional[GemmaPlanner] = None
+_PLANNER_INIT_LOCK = Lock()
+
+
+def get_planner() -> GemmaPlanner:
+    """프로세스 공용 GemmaPlanner(여러 곳에서 써도 인스턴스/모델은 하나, 모델 로드는 첫 LLM 호출 때)."""
+    global _PLANNER
+    if _PLANNER is None:
+        with _PLANNER_INIT_LOCK:
+            if _PLANNER is None:
+                _PLANNER = GemmaPlanner()
+    return _PLANNER
+
+
 class DummyPlanner:
     """
     더미 플래너(규칙 기반).
@@ -405,41 +779,44 @@ class DummyPlanner:
     - "move last +2" -> 마지막 생성 이벤트를 오른쪽 2tick 이동
     - "delete last" -> 마지막 생성 이벤트 삭제
     - "undo" / "undo 2"
+
+    더미 자신의 규칙(undo / place bass / pattern 등, 인자 처리가 rule_first_plan과 다름)을 먼저 보고,
+    어디에도 안 걸린 명령(move·delete selected / transpose 등)만 rule_first_plan 결과를 그대로 씁니다.
     """
 
     def make_plan(self, message: str) -> Plan:
         m = message.strip().lower()
-        plan = Plan(summary=f"dummy plan for: {message}")
+        plan = Plan.model_construct(summary=f"dummy plan for: {message}")
 
-        # undo
+        # undo (숫자가 아니면 1스텝)
         if m.startswith("undo"):
             parts = m.split()
-            steps = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1
-            plan.actions.append(PlanAction(tool="undo", args={"steps": steps}))
+            steps = int(parts[1]) if len(parts) > 1 and parts[1].isdecimal() else 1
+            plan.actions.append(PlanAction.model_construct(tool="undo", args={"steps": steps}))
             return plan
 
         # move last
         if m.startswith("move last"):
             # ex) "move last +2"
             delta = 1
-            mm = re.search(r"([+-]?\d+)", m)
+            mm = RE_SIGNED_INT.search(m)
             if mm:
                 delta = int(mm.group(1))
             plan.actions.append(
-                PlanAction(tool="move_event", args={"event_ref": "last_created", "delta_tick": delta})
+                PlanAction.model_construct(tool="move_event", args={"event_ref": "last_created", "delta_tick": delta})
             )
             return plan
 
         # delete last
         if m.startswith("delete last"):
-            plan.actions.append(PlanAction(tool="delete_event", args={"event_ref": "last_created"}))
+            plan.actions.append(PlanAction.model_construct(tool="delete_event", args={"event_ref": "last_created"}))
             return plan
 
         # very simple drum shortcuts
         if "kick" in m:
             # default: track 1, start 1:1
             plan.actions.append(
-                PlanAction(tool="place_drum", args={
+                PlanAction.model_construct(tool="place_drum", args={
                     "track_id": 1, "start": "1:1", "duration_tick": 1,
                     "sample_id": "drum_kick_001", "velocity": 0.95
                 })
@@ -448,7 +825,7 @@ class DummyPlanner:
 
         if "snare" in m:
             plan.actions.append(
-                PlanAction(tool="place_drum", args={
+                PlanAction.model_construct(tool="place_drum", args={
                     "track_id": 1, "start": "1:5", "duration_tick": 1,  # 2박 시작(대충)
                     "sample_id": "drum_snare_001", "velocity": 0.85
                 })
@@ -462,7 +839,7 @@ class DummyPlanner:
             pitch = parts[2].upper() if len(parts) >= 3 else "A1"
             start = parts[3] if len(parts) >= 4 else "1:1"
             plan.actions.append(
-                PlanAction(tool="place_note", args={
+                PlanAction.model_construct(tool="place_note", args={
                     "track_id": 2, "start": start, "duration_tick": 4,
                     # "sample_id": "bass_A1_001", 
                     "pitch": pitch, "velocity": 0.85
@@ -470,23 +847,6 @@ class DummyPlanner:
             )
             return plan
         
-        # move selected
-        if m.startswith("move selected"):
-            # ex) "move selected +2"
-            delta = 1
-            mm = re.search(r"([+-]?\d+)", m)
-            if mm:
-                delta = int(mm.group(1))
-            plan.actions.append(
-                PlanAction(tool="move_event", args={"event_ref": "last_selected", "delta_tick": delta})
-            )
-            return plan
-
-        # delete selected
-        if m.startswith("delete selected"):
-            plan.actions.append(PlanAction(tool="delete_event", args={"event_ref": "last_selected"}))
-            return plan
-        
         '''
         set pitch D#4
         transpose +2
@@ -499,33 +859,25 @@ class DummyPlanner:
             parts = m.split()
             pitch = parts[2].upper() if len(parts) >= 3 else "C4"
             plan.actions.append(
-                PlanAction(tool="set_pitch", args={"event_ref": "last_selected", "pitch": pitch})
+                PlanAction.model_construct(tool="set_pitch", args={"event_ref": "last_selected", "pitch": pitch})
             )
             return plan
 
-        # transpose
-        if m.startswith("transpose"):
-            # ex) "transpose +2"
-            delta = 0
-            mm = re.search(r"([+-]?\d+)", m)
-            if mm:
-                delta = int(mm.group(1))
-            plan.actions.append(
-                PlanAction(tool="transpose_event", args={"event_ref": "last_selected", "semitone": delta})
-            )
-            return plan
-        
         # DummyPlanner 규칙만 추가
         if m.startswith("pattern"):
             # ex) pattern four / pattern backbeat / pattern hat8
             if "four" in m:
-                plan.actions.append(PlanAction(tool="apply_drum_pattern", args={"pattern": "four_on_the_floor", "bars": 1, "base_bar": 1}))
+                plan.actions.append(PlanAction.model_construct(tool="apply_drum_pattern", args={"pattern": "four_on_the_floor", "bars": 1, "base_bar": 1}))
             elif "back" in m:
-                plan.actions.append(PlanAction(tool="apply_drum_pattern", args={"pattern": "backbeat", "bars": 1, "base_bar": 1}))
+                plan.actions.append(PlanAction.model_construct(tool="apply_drum_pattern", args={"pattern": "backbeat", "bars": 1, "base_bar": 1}))
             elif "hat" in m:
-                plan.actions.append(PlanAction(tool="apply_drum_pattern", args={"pattern": "hihat_8th", "bars": 1, "base_bar": 1}))
+                plan.actions.append(PlanAction.model_construct(tool="apply_drum_pattern", args={"pattern": "hihat_8th", "bars": 1, "base_bar": 1}))
             return plan
 
+        # move·delete selected / transpose 등은 공용 룰
+        p = rule_first_plan(message)
+        if p:
+            return p
 
         # default fallback: do nothing
         plan.assumptions.append("No recognized command. No actions executed.")
@@ -1,10 +1,9 @@
-from app.services.llm_service import GemmaPlanner
+from app.services.llm_service import get_planner
 from app.core.command_schema import Command
 
-planner = GemmaPlanner()
 
 def parse_with_llm(text: str, state_hint: dict) -> list[Command]:
-    plan = planner.make_plan(text, state_hint)
+    plan = get_planner().make_plan(text, state_hint)
     cmds = []
 
     for act in plan.actions:
@@ -2,17 +2,36 @@ import re
 from typing import Optional
 from app.core.command_schema import Command
 
+RE_BPM = re.compile(r"bpm\s*(\d+)")
+RE_BARS = re.compile(r"(\d+)\s*마디")
+
+# 아래 룰들 중 하나라도 걸릴 수 있는 키워드를 한 번에 검사하는 사전 필터.
+# 대부분의 채팅(LLM으로 갈 메시지)은 여기서 한 번의 스캔으로 바로 None.
+# 룰을 추가하면 키워드도 여기에 같이 추가해야 합니다.
+RE_ANY_RULE = re.compile(
+    r"bpm\s*\d|\d\s*마디|16분|8분|4분|볼륨|소리|왼쪽|좌측|오른쪽|우측|뮤트|솔로"
+)
+# 그룹별 키워드(각각 한 번의 스캔으로 검사)
+RE_VOLUME = re.compile(r"볼륨|소리")
+RE_VOL_DOWN = re.compile(r"줄|낮")
+RE_VOL_UP = re.compile(r"올|크")
+RE_PAN_LEFT = re.compile(r"왼쪽|좌측")
+RE_PAN_RIGHT = re.compile(r"오른쪽|우측")
+
 
 def parse_rule_command(text: str) -> Optional[Command]:
     t = text.lower().strip()
 
+    if not RE_ANY_RULE.search(t):
+        return None
+
     # BPM
-    m = re.search(r"bpm\s*(\d+)", t)
+    m = RE_BPM.search(t)
     if m:
         return Command(type="set_bpm", value=int(m.group(1)))
 
     # bars
-    m = re.search(r"(\d+)\s*마디", t)
+    m = RE_BARS.search(t)
     if m:
         return Command(type="set_bars", value=int(m.group(1)))
 
@@ -25,17 +44,20 @@ def parse_rule_command(text: str) -> Optional[Command]:
         return Command(type="set_grid", value="1/4")
 
     # track volume
-    for tr in ["드럼", "베이스", "패드", "리드"]:
-        if tr in t and ("볼륨" in t or "소리" in t):
-            if "줄" in t or "낮" in t:
-                return Command(type="set_track_volume", track=_map_track(tr), value=0.6)
-            if "올" in t or "크" in t:
-                return Command(type="set_track_volume", track=_map_track(tr), value=0.9)
+    if RE_VOLUME.search(t):
+        vol_down = RE_VOL_DOWN.search(t) is not None
+        vol_up = RE_VOL_UP.search(t) is not None
+        for tr in ["드럼", "베이스", "패드", "리드"]:
+            if tr in t:
+                if vol_down:
+                    return Command(type="set_track_volume", track=_map_track(tr), value=0.6)
+                if vol_up:
+                    return Command(type="set_track_volume", track=_map_track(tr), value=0.9)
 
     # pan
-    if "왼쪽" in t or "좌측" in t:
+    if RE_PAN_LEFT.search(t):
         return Command(type="set_track_pan", track=_guess_track(t), value=-0.5)
-    if "오른쪽" in t or "우측" in t:
+    if RE_PAN_RIGHT.search(t):
         return Command(type="set_track_pan", track=_guess_track(t), value=0.5)
 
     # mute / solo
@@ -0,0 +1,247 @@
+"""
+project_cache.py
+
+ProjectState 인메모리 캐시.
+요청마다 프로젝트 JSON을 다시 읽고 파싱하지 않도록,
+파일의 (mtime, size)가 그대로면 이미 파싱해 둔 ProjectState를 재사용합니다.
+
+파일 I/O는 aiofiles로 처리해서 이벤트 루프를 막지 않습니다.
+(API 핸들러는 async def에서 await project_cache.get(...) / save(...) 로 사용)
+
+주의:
+- 반환된 state는 캐시에 들어있는 객체 그 자체입니다(복사본 아님).
+  수정했으면 반드시 save()로 저장해야 디스크/캐시가 어긋나지 않습니다.
+  수정 구간은 discard_on_error()로 감싸서 실패 시 반쯤 바뀐 state가 캐시에 남지 않게 합니다.
+- 단일 프로세스 전용(멀티 워커에서는 각 워커가 자기 캐시를 가짐).
+  다른 프로세스/job 스레드가 파일을 고치면 mtime이 바뀌므로 다음 get()에서 다시 로드됩니다.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import aiofiles
+import aiofiles.os
+
+from app.core.state import ProjectState, temp_path_for
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = 32
+# save_later() 디바운스 간격(초)
+SAVE_DEBOUNCE_SEC = 0.05
+
+# path -> ((mtime_ns, size), ProjectState)
+_CACHE: "OrderedDict[Path, tuple[tuple[int, int], ProjectState]]" = OrderedDict()
+# 같은 프로젝트를 동시에 여러 번 파싱하지 않도록 path별 로드 락
+_LOAD_LOCKS: dict[Path, asyncio.Lock] = {}
+# project_id -> 수정용 락(load -> mutate -> save 구간 직렬화)
+_PROJECT_LOCKS: dict[str, asyncio.Lock] = {}
+# 디바운스 대기 중인 저장 예약
+_PENDING: dict[Path, asyncio.TimerHandle] = {}
+# save_later()로 수정됐지만 아직 디스크에 안 쓴 프로젝트(save()/invalidate()에서 빠짐)
+_DIRTY: set[Path] = set()
+# 실행 중인 디바운스 저장 태스크(참조를 잡아둬야 도중에 GC되지 않음, 끝나면 제거)
+_FLUSH_TASKS: set[asyncio.Task] = set()
+
+
+def lock(project_id: str) -> asyncio.Lock:
+    """
+    프로젝트별 수정 락.
+    같은 프로젝트에 대한 load -> mutate -> save가 서로 끼어들지 않도록
+    수정하는 핸들러는 `async with project_cache.lock(project_id):` 안에서 처리합니다.
+    (프로젝트마다 따로라서 다른 프로젝트 요청은 막지 않음)
+    """
+    lk = _PROJECT_LOCKS.get(project_id)
+    if lk is None:
+        lk = _PROJECT_LOCKS[project_id] = asyncio.Lock()
+    return lk
+
+
+async def _stamp(path: Path) -> tuple[int, int]:
+    st = await aiofiles.os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _lookup(path: Path, stamp: tuple[int, int]) -> ProjectState | None:
+    hit = _CACHE.get(path)
+    if hit is None or hit[0] != stamp:
+        return None
+    _CACHE.move_to_end(path)
+    return hit[1]
+
+
+def _store(path: Path, stamp: tuple[int, int], state: ProjectState) -> None:
+    _CACHE[path] = (stamp, state)
+    _CACHE.move_to_end(path)
+    while len(_CACHE) > MAX_ENTRIES:
+        old, _ = _CACHE.popitem(last=False)
+        _LOAD_LOCKS.pop(old, None)
+
+
+async def get(path: Path) -> ProjectState:
+    """
+    캐시된 ProjectState 반환(파일이 바뀌었으면 다시 로드).
+    파일이 없으면 FileNotFoundError.
+    """
+    stamp = await _stamp(path)
+    state = _lookup(path, stamp)
+    if state is not None:
+        return state
+
+    load_lock = _LOAD_LOCKS.setdefault(path, asyncio.Lock())
+    async with load_lock:
+        # 기다리는 동안 다른 요청이 이미 로드했을 수 있음
+        stamp = await _stamp(path)
+        state = _lookup(path, stamp)
+        if state is not None:
+            return state
+
+        async with aiofiles.open(path, "rb") as f:
+            raw = await f.read()
+        state = ProjectState.loads(raw)
+        _store(path, stamp, state)
+        return state
+
+
+async def get_or_none(path: Path) -> ProjectState | None:
+    """get()과 같지만 파일이 없으면 None (핸들러의 404 체크용, 별도 exists() stat 불필요)."""
+    try:
+        return await get(path)
+    except FileNotFoundError:
+        return None
+
+
+async def save(path: Path, state: ProjectState) -> None:
+    """
+    state를 저장하고, 새 mtime으로 캐시를 갱신합니다.
+    임시 파일에 쓴 뒤 교체하므로 다른 요청/job이 반쯤 쓴 파일을 읽는 일이 없습니다.
+    """
+    _cancel_pending(path)
+    _DIRTY.discard(path)
+    state.touch()
+    data = state.dumps()
+    await aiofiles.os.makedirs(path.parent, exist_ok=True)
+    tmp = temp_path_for(path)
+    try:
+        async with aiofiles.open(tmp, "wb") as f:
+            await f.write(data)
+        await aiofiles.os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    _store(path, await _stamp(path), state)
+
+
+def _cancel_pending(path: Path) -> None:
+    handle = _PENDING.pop(path, None)
+    if handle is not None:
+        handle.cancel()
+
+
+def save_later(path: Path, state: ProjectState, delay: float = SAVE_DEBOUNCE_SEC) -> None:
+    """
+    저장을 delay초 뒤로 미룹니다(드래그/방향키처럼 연속으로 오는 수정용).
+    그 사이에 다시 호출되면 이전 예약은 취소되어, 마지막 상태만 한 번 저장됩니다.
+
+    캐시에는 수정된 state가 그대로 있으므로 get()은 바로 최신 상태를 돌려줍니다.
+    path는 project_path(project_id) 모양이어야 합니다(저장 시 lock(path.stem)을 잡음).
+    """
+    state.touch()
+    _cancel_pending(path)
+    _DIRTY.add(path)
+    loop = asyncio.get_running_loop()
+    _PENDING[path] = loop.call_later(delay, _start_flush, path)
+
+
+def _start_flush(path: Path) -> None:
+    _PENDING.pop(path, None)
+    task = asyncio.get_running_loop().create_task(_flush(path))
+    _FLUSH_TASKS.add(task)
+    task.add_done_callback(_flush_done)
+
+
+def _flush_done(task: asyncio.Task) -> None:
+    _FLUSH_TASKS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("debounced project save failed", exc_info=task.exception())
+
+
+async def _flush(path: Path) -> None:
+    async with lock(path.stem):  # project_path()의 파일명 = project_id
+        await _flush_locked(path)
+
+
+async def _flush_locked(path: Path) -> None:
+    """
+    미뤄둔 저장 실행(프로젝트 락 안에서 호출).
+    예약 이후 파일이 다른 쪽(job 스레드 등)에서 바뀌었으면 덮어쓰지 않고 캐시를 버림
+    (오래된 state로 다른 쪽 저장을 지우는 것보다 미뤄둔 수정 하나를 잃는 쪽이 안전).
+    """
+    if path not in _DIRTY:
+        # 그 사이 save()/flush()로 이미 저장됐거나 invalidate() 됨
+        return
+    hit = _CACHE.get(path)
+    if hit is None:
+        _DIRTY.discard(path)
+        return
+    stamp, state = hit
+    try:
+        disk = await _stamp(path)
+    except FileNotFoundError:
+        disk = None
+    if disk != stamp:
+        logger.warning("project file %s changed on disk before debounced save; dropping cached state", path)
+        invalidate(path)
+        return
+    # save()가 그 사이 새로 잡힌 예약(_PENDING)까지 정리
+    await save(path, state)
+
+
+async def flush(path: Path) -> None:
+    """
+    path에 미뤄둔 저장이 있으면 지금 디스크에 씀.
+    파일을 직접 읽는 쪽(렌더 워커 등)에 넘기기 전에, 그 프로젝트의 락을 잡은 상태에서 호출합니다.
+    """
+    _cancel_pending(path)
+    await _flush_locked(path)
+
+
+async def flush_pending() -> None:
+    """예약된/실행 중인 저장을 모두 끝냄(서버 종료 시 호출)."""
+    for path in list(_DIRTY):
+        _cancel_pending(path)
+        await _flush(path)
+    if _FLUSH_TASKS:
+        await asyncio.gather(*_FLUSH_TASKS, return_exceptions=True)
+
+
+@contextmanager
+def discard_on_error(path: Path):
+    """
+    캐시된 state를 고치는 구간을 감쌉니다.
+    중간에 예외가 나면 반쯤 바뀐 state가 캐시에 남아 다음 요청이 그걸 읽고/저장하지 않도록 캐시에서 버림
+    (파일은 그대로라 다음 get()에서 마지막 저장본을 다시 로드).
+
+        async with project_cache.lock(project_id):
+            state = await project_cache.get(path)
+            with project_cache.discard_on_error(path):
+                ...수정...
+                await project_cache.save(path, state)
+    """
+    try:
+        yield
+    except BaseException:
+        invalidate(path)
+        raise
+
+
+def invalidate(path: Path) -> None:
+    """캐시에서 제거(다음 get()에서 디스크로부터 다시 로드)."""
+    _cancel_pending(path)
+    _DIRTY.discard(path)
+    _CACHE.pop(path, None)
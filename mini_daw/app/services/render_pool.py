@@ -0,0 +1,66 @@
+"""
+render_pool.py
+
+렌더(믹스다운/프리뷰)처럼 CPU를 오래 쓰는 작업을 돌리는 프로세스 풀.
+
+job은 JobQueue의 백그라운드 스레드에서 실행되지만, 믹서의 Python 루프는 GIL을 잡고 있어서
+렌더 여러 개가 동시에 오면 스레드끼리 서로 막습니다.
+렌더 본체만 별도 프로세스로 넘기고, job 스레드는 결과를 기다리면서 진행률만 갱신합니다.
+
+주의:
+- 풀에 넘기는 함수/인자는 pickle 가능해야 합니다(모듈 최상위 함수 + Path/dataclass 등).
+- 워커는 spawn으로 띄웁니다(모델/스레드가 있는 서버 프로세스를 fork하지 않도록).
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Any, Callable, Optional
+
+# 서버(이벤트 루프/job 스레드)용으로 코어 하나는 남겨둠
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """프로세스 풀(처음 쓸 때 생성)."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ProcessPoolExecutor(
+                    max_workers=MAX_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _POOL
+
+
+def run(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    fn(*args, **kwargs)를 워커 프로세스에서 실행하고 결과를 기다립니다(job 스레드에서 호출).
+    워커가 죽어서 풀이 깨지면 다음 호출 때 새 풀을 만들도록 버립니다.
+    """
+    global _POOL
+    pool = get_pool()
+    try:
+        return pool.submit(fn, *args, **kwargs).result()
+    except BrokenProcessPool:
+        with _POOL_LOCK:
+            if _POOL is pool:
+                _POOL = None
+        raise
+
+
+def shutdown() -> None:
+    """풀 종료(서버 종료 시 호출)."""
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -1,56 +1,36 @@
 """
 stable_audio_service.py
 
-Stable Audio Open 모델 호출 스켈레톤.
+Stable Audio Open 모델 호출 서비스.
 - 모델은 게이트(repo access)일 수 있으니 HF 토큰/권한 필요
-- 환경에 따라 diffusers/torch 오디오 처리 구성 필요
-
-Step8 성공 상태에서 "일단 붙일 자리"만 안정적으로 제공
+- torch/diffusers/numpy/soundfile은 실제로 쓰는 시점에 import(앱 부팅 시 로드하지 않음)
 """
 
 from __future__ import annotations
 
+import inspect
+import logging
 import os
-from dataclasses import dataclass
+from concurrent.futures import Future
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
-
-import numpy as np
-import soundfile as sf
-
-# class StableAudioOpenService:
-#     def __init__(self, model_id: str = "stabilityai/stable-audio-open-1.0", hf_token: Optional[str] = None):
-#         self.model_id = model_id
-#         self.hf_token = hf_token
-#         self._pipe = None
-
-#     def _lazy_load(self):
-#         if self._pipe is not None:
-#             return
-
-#         # ⚠️ 실제 사용 시 diffusers 버전/파이프라인 클래스가 환경에 맞아야 합니다.
-#         # 환경이 다를 수 있어서 "자리"만 제공합니다.
-#         from huggingface_hub import login
-#         if self.hf_token:
-#             login(self.hf_token)
-
-#         # 예시(환경에 따라 다를 수 있음):
-#         # from diffusers import StableAudioPipeline
-#         # self._pipe = StableAudioPipeline.from_pretrained(self.model_id, torch_dtype="auto").to("cuda")
-#         self._pipe = None  # 여기서 실제 파이프라인을 구성하세요.
-
-#     def generate(self, prompt: str, seconds: float, out_wav: Path) -> None:
-#         """
-#         prompt로 오디오 생성 후 out_wav로 저장.
-#         """
-#         self._lazy_load()
-#         if self._pipe is None:
-#             raise RuntimeError("StableAudio pipeline is not configured yet. Set up diffusers pipeline in _lazy_load().")
-
-#         # 실제 생성/저장 로직은 환경별로 달라서 여기서 구현
-#         # 예: waveform = self._pipe(prompt=prompt, audio_length_in_s=seconds).audios[0]
-#         # 저장: soundfile.write(out_wav, waveform, samplerate=44100)
-#         raise NotImplementedError
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+from app.config import CONFIG
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# torch.compile 모드에서는 생성 길이를 이 버킷 중 하나로 올려서 생성하고 결과를 요청 길이로 자름
+# (입력 모양이 고정돼야 컴파일된 그래프/CUDA graph를 다시 만들지 않고 재사용)
+SA_COMPILE_SECONDS = (5.0, 10.0, 20.0, 47.0)
+# 캐시해 두는 negative prompt 임베딩 개수(보통 기본값 하나만 씀)
+NEG_EMBED_CACHE_SIZE = 8
+# VAE 타일 decode 시 타일 양쪽으로 더 decode했다가 버리는 latent 프레임 수(decoder receptive field보다 크게)
+VAE_TILE_OVERLAP = 32
 
 
 @dataclass
@@ -59,8 +39,50 @@ class StableAudioGenParams:
     seconds: float = 1.5
     negative_prompt: str = "low quality, noisy, distorted"
     seed: Optional[int] = None
-    num_inference_steps: int = 50
-    guidance_scale: float = 7.0
+    # 스케줄러는 파이프라인 기본(CosineDPMSolverMultistepScheduler, DPM++ 2차) → 20~30스텝이면 충분
+    num_inference_steps: int = field(default_factory=lambda: CONFIG.sa_steps)
+    guidance_scale: float = field(default_factory=lambda: CONFIG.sa_guidance)
+    # CFG를 적용할 앞쪽 스텝 비율(뒤쪽 스텝은 조건부 forward만)
+    guidance_cutoff_frac: float = field(default_factory=lambda: CONFIG.sa_cfg_cutoff)
+
+
+class _CfgCutoff:
+    """
+    guidance interval: 앞쪽 cutoff 스텝까지만 CFG, 이후 스텝은 transformer를 조건부 절반만 돌림.
+
+    StableAudioPipeline은 CFG 여부를 호출 시작 때 한 번 정해서(guidance_scale > 1) 매 스텝 batch를
+    [무조건, 조건] 두 배로 넣고 uncond + g * (cond - uncond)로 섞음. cutoff 이후에는 조건부 절반만
+    계산해서 [cond, cond]로 돌려주면 섞은 결과가 cond 그대로라 그 스텝들의 transformer 연산이 절반.
+    생성 한 번 동안만 pipe.transformer 자리에 끼워 넣고(스텝 수를 셈) 끝나면 되돌립니다.
+    """
+
+    def __init__(self, transformer, cutoff: int):
+        self._inner = transformer
+        self._cutoff = cutoff
+        self._step = 0
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def __call__(self, hidden_states, *args, **kwargs):
+        step = self._step
+        self._step += 1
+        if step < self._cutoff:
+            return self._inner(hidden_states, *args, **kwargs)
+
+        import torch
+
+        n = hidden_states.shape[0]
+        half = n // 2
+
+        def cond(x):
+            # batch 축이 있는 입력(latent, 텍스트/길이 임베딩)만 조건부 절반으로
+            return x[half:] if getattr(x, "ndim", 0) and x.shape[0] == n else x
+
+        out = self._inner(cond(hidden_states), *args, **{k: cond(v) for k, v in kwargs.items()})
+        if isinstance(out, tuple):
+            return (torch.cat([out[0], out[0]]),) + out[1:]
+        return type(out)(sample=torch.cat([out.sample, out.sample]))
 
 
 class StableAudioOpenService:
@@ -82,6 +104,13 @@ class StableAudioOpenService:
         self.hf_token = hf_token or os.getenv("HF_TOKEN")
         self.device = device  # "cuda" / "cpu" / None(auto)
         self._pipe = None
+        # torch.compile 적용 시 원래 (transformer, vae.decode). None이면 eager
+        self._eager = None
+        # negative prompt -> (텍스트 인코더 출력, attention mask). 매 생성마다 같은 문장을 다시 인코딩하지 않도록
+        self._neg_cache: dict[str, tuple] = {}
+        self._neg_embeds_ok = False
+        # batch 자리별 torch.Generator(매 생성마다 새로 만들지 않고 manual_seed로 다시 시드)
+        self._gens: list = []
 
     def _lazy_load(self):
         if self._pipe is not None:
@@ -94,7 +123,18 @@ class StableAudioOpenService:
         if self.device is None:
             self.device = "cuda" if torch.cuda.is_available() else "cpu"
 
-        dtype = torch.float16 if (self.device == "cuda") else torch.float32
+        dtype = torch.float32
+        if self.device == "cuda":
+            # Ampere(sm80) 이상은 bf16: fp16과 대역폭은 같고 지수 범위가 fp32와 같아서 VAE 등에서 overflow/NaN 걱정이 없음
+            major, _ = torch.cuda.get_device_capability()
+            dtype = torch.bfloat16 if major >= 8 else torch.float16
+
+        if self.device == "cuda":
+            # attention은 diffusers 기본 프로세서(StableAudioAttnProcessor2_0)가 이미 SDPA(flash/mem-efficient) 사용.
+            # 나머지: fp32로 남는 matmul/conv는 TF32, VAE(Oobleck) conv는 길이가 같으면 cudnn이 고른 알고리즘 재사용
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+            torch.backends.cudnn.benchmark = True
 
         # gated 모델이면 token 필요
         # (diffusers 내부에서 HF hub auth 사용)
@@ -102,40 +142,241 @@ class StableAudioOpenService:
         if self.hf_token:
             kwargs["token"] = self.hf_token
 
-        pipe = StableAudioPipeline.from_pretrained(self.model_id, **kwargs)
+        kwargs["low_cpu_mem_usage"] = True  # 가중치를 빈 모듈에 바로 로드(CPU 쪽 랜덤 초기화/중복 복사 없음)
+        try:
+            # 이미 받아 둔 스냅샷이면 허브에 파일별 확인 요청 없이 로컬 캐시의 safetensors(mmap)에서 바로 로드
+            pipe = StableAudioPipeline.from_pretrained(
+                self.model_id, local_files_only=True, use_safetensors=True, **kwargs
+            )
+        except (OSError, ValueError):
+            # 첫 실행(캐시 없음) 등 → 허브에서 받아서 로드
+            pipe = StableAudioPipeline.from_pretrained(self.model_id, **kwargs)
 
-        pipe = pipe.to(self.device)
         self._pipe = pipe
+        self._neg_cache.clear()
+        # negative_prompt_embeds를 받는 diffusers 버전이면 negative prompt 임베딩을 캐시해서 넘김
+        self._neg_embeds_ok = "negative_prompt_embeds" in inspect.signature(pipe.__call__).parameters
+        cuda = self.device == "cuda"
+        if cuda and CONFIG.sa_quant == "int8":
+            self._quantize()
+
+        offload = cuda and CONFIG.sa_offload in ("model", "sequential")
+        if not offload:
+            pipe.to(self.device)
+        elif CONFIG.sa_offload == "model":
+            # 텍스트 인코더/transformer/VAE를 쓰는 동안만 GPU로(최대 VRAM ≈ 가장 큰 모듈 하나)
+            pipe.enable_model_cpu_offload()
+        else:
+            # 레이어 단위로 올렸다 내림(VRAM 최소, 대신 매우 느림)
+            pipe.enable_sequential_cpu_offload()
 
-    def generate_to_wav(self, params: StableAudioGenParams, out_wav: Path) -> None:
+        if CONFIG.sa_vae_tile_s > 0:
+            self._tile_vae_decode(CONFIG.sa_vae_tile_s)
+
+        if cuda and CONFIG.sa_compile:
+            if offload:
+                # 오프로드 hook이 매 호출 가중치를 옮기므로 CUDA graph로 캡처할 수 없음
+                logger.warning("MINI_DAW_SA_COMPILE is ignored with MINI_DAW_SA_OFFLOAD")
+            else:
+                self._compile()
+
+    def _tile_vae_decode(self, tile_s: float) -> None:
         """
-        prompt 기반으로 오디오 생성 후 wav로 저장.
+        VAE decode를 시간축 타일로 나눠서 합니다(47초 같은 긴 생성에서 decode 활성값이 가장 큰 할당).
+        diffusers의 오디오 VAE(Oobleck)에는 enable_tiling이 없어서 직접 나눔:
+        타일마다 양옆 VAE_TILE_OVERLAP 프레임을 더 decode하고 그 부분은 버림(overlap-discard, 이음매 없음).
+        FLOPs는 겹치는 만큼만 늘고, 최대 VRAM은 타일 길이에 비례.
+        타일 길이는 latent 길이를 같은 크기로 나누도록 맞춤(마지막에 짧은 자투리 타일이 따로 decode되지 않게).
         """
-        self._lazy_load()
+        import torch
+
+        vae = self._pipe.vae
+        decode = vae.decode
+        sr = int(getattr(vae, "sampling_rate", 44100))
+        hop = int(getattr(vae, "hop_length", 2048))  # latent 1프레임 = hop 샘플
+        tile = max(1, round(tile_s * sr / hop))
+        overlap = VAE_TILE_OVERLAP
+
+        def tiled_decode(z, return_dict: bool = True, **kwargs):
+            n = z.shape[-1]
+            if n <= tile + 2 * overlap:
+                return decode(z, return_dict=return_dict, **kwargs)
+            # 예: n=1024, tile_s=10s(≈215프레임) → 215×4+164 대신 205×4+204 (타일 수는 그대로 5개, 크기만 고르게)
+            step = -(-n // -(-n // tile))
+            chunks = []
+            out = None
+            for start in range(0, n, step):
+                a = max(0, start - overlap)
+                b = min(n, start + step + overlap)
+                out = decode(z[..., a:b], **kwargs)
+                x = out.sample
+                up = x.shape[-1] // (b - a)
+                chunks.append(x[..., (start - a) * up:(min(start + step, n) - a) * up])
+            sample = torch.cat(chunks, dim=-1)
+            if not return_dict:
+                return (sample,)
+            return type(out)(sample=sample)
+
+        vae.decode = tiled_decode
+
+    def _negative_embeds(self, text: str) -> tuple:
+        """
+        negative prompt의 텍스트 인코더 출력(projection 전)과 attention mask.
+        파이프라인 내부 encode_prompt와 같은 방식(max_length 패딩)으로 인코딩해서 캐시합니다.
+        """
+        hit = self._neg_cache.get(text)
+        if hit is not None:
+            return hit
 
         import torch
 
-        out_wav.parent.mkdir(parents=True, exist_ok=True)
+        pipe = self._pipe
+        inputs = pipe.tokenizer(
+            text,
+            padding="max_length",
+            max_length=pipe.tokenizer.model_max_length,
+            truncation=True,
+            return_tensors="pt",
+        )
+        device = pipe._execution_device
+        ids = inputs.input_ids.to(device)
+        mask = inputs.attention_mask.to(device)
+        with torch.no_grad():
+            embeds = pipe.text_encoder(ids, attention_mask=mask)[0]
+
+        if len(self._neg_cache) >= NEG_EMBED_CACHE_SIZE:
+            self._neg_cache.clear()
+        self._neg_cache[text] = (embeds, mask)
+        return embeds, mask
+
+    def _quantize(self) -> None:
+        """
+        denoiser(transformer) 가중치를 int8(weight-only)로 양자화합니다.
+        디노이징 스텝마다 가중치를 다시 읽는 대역폭 병목이라 가중치 바이트가 절반이면 스텝도 그만큼 빨라짐.
+        텍스트 인코더/VAE는 생성당 한 번만 돌아서 fp16 그대로.
+        torchao가 없으면 optimum-quanto, 둘 다 없으면 경고만 하고 fp16 유지.
+        """
+        transformer = self._pipe.transformer
+        try:
+            from torchao.quantization import quantize_
+            try:
+                from torchao.quantization import Int8WeightOnlyConfig as int8_weight_only
+            except ImportError:  # 예전 torchao
+                from torchao.quantization import int8_weight_only
+
+            quantize_(transformer, int8_weight_only())
+            return
+        except ImportError:
+            pass
+        try:
+            from optimum.quanto import freeze, qint8, quantize
 
-        gen = None
-        if params.seed is not None:
-            gen = torch.Generator(device=self.device).manual_seed(int(params.seed))
+            quantize(transformer, weights=qint8)
+            freeze(transformer)
+        except ImportError:
+            logger.warning("MINI_DAW_SA_QUANT=int8 needs torchao or optimum-quanto; keeping fp16 weights")
 
-        # Stable Audio Open은 최대 길이 제한이 있음(대략 47s)
-        seconds = float(params.seconds)
-        seconds = max(0.2, min(seconds, 47.0))
+    def _compile(self) -> None:
+        """
+        denoiser(transformer)와 VAE decode를 torch.compile(reduce-overhead = CUDA graph)로 감쌉니다.
+        스텝(50~120번)마다 파이썬에서 커널을 하나씩 launch하는 비용을 graph 재생으로 줄임.
+        길이 버킷(SA_COMPILE_SECONDS)마다 첫 생성은 컴파일 때문에 오래 걸림.
+        """
+        import torch
 
-        # diffusers pipeline 출력
-        result = self._pipe(
-            params.prompt,  # prompt는 positional로 넣어도 됨
-            negative_prompt=params.negative_prompt,
-            num_inference_steps=int(params.num_inference_steps),
-            guidance_scale=float(params.guidance_scale),
+        pipe = self._pipe
+        self._eager = (pipe.transformer, pipe.vae.decode)
+        pipe.transformer = torch.compile(pipe.transformer, mode="reduce-overhead", dynamic=False)
+        pipe.vae.decode = torch.compile(pipe.vae.decode, mode="reduce-overhead", dynamic=False)
+
+    def _uncompile(self) -> None:
+        self._pipe.transformer, self._pipe.vae.decode = self._eager
+        self._eager = None
+
+    def generate_to_wav(self, params: StableAudioGenParams, out_wav: Path) -> None:
+        """
+        prompt 기반으로 오디오 생성 후 wav로 저장.
+        """
+        audio, sr = self.generate(params)
+        write_wav(out_wav, audio, sr)
+
+    def generate(self, params: StableAudioGenParams) -> tuple[np.ndarray, int]:
+        """
+        prompt 기반으로 오디오 생성. (audio(samples, channels) float32, sample_rate) 반환.
+        GPU 작업만 하고 파일 저장은 하지 않으므로, 호출 측이 GPU 락을 잡고 있다면
+        저장(write_wav)은 락을 푼 뒤에 해서 다음 생성이 디스크 I/O를 기다리지 않게 할 수 있음.
+        """
+        return self.generate_many([params])[0]
+
+    def generate_many(self, batch: list[StableAudioGenParams]) -> list[tuple[np.ndarray, int]]:
+        """
+        여러 요청을 파이프라인 한 번(batch)으로 생성. 요청 순서대로 (audio, sample_rate) 반환.
+        디노이징 스텝 비용은 batch 1이나 4나 크게 다르지 않아서 동시에 온 요청을 묶으면 처리량이 늘어남.
+        - num_inference_steps / guidance_scale / guidance_cutoff_frac은 batch 안에서 같아야 함(첫 요청 값 사용)
+        - 길이는 가장 긴 요청에 맞춰 생성하고 각자 길이로 자름
+        """
+        self._lazy_load()
+
+        import torch
+
+        first = batch[0]
+
+        def make_generator():
+            # seed가 하나도 없으면 None, 있으면 요청별 generator(batch 1이면 리스트 대신 하나)
+            if all(p.seed is None for p in batch):
+                return None
+            while len(self._gens) < len(batch):
+                self._gens.append(torch.Generator(device=self.device))
+            gens = self._gens[: len(batch)]
+            for g, p in zip(gens, batch):
+                if p.seed is not None:
+                    g.manual_seed(int(p.seed))
+                else:
+                    # diffusers는 generator 리스트에 None을 못 받음 → seed 없는 자리는 랜덤 시드
+                    g.seed()
+            return gens[0] if len(gens) == 1 else gens
+
+        seconds = [_clamp_seconds(p) for p in batch]
+        gen_seconds = max(seconds)
+        if self._eager is not None:
+            gen_seconds = next(b for b in SA_COMPILE_SECONDS if b >= gen_seconds)
+
+        single = len(batch) == 1
+        prompt = first.prompt if single else [p.prompt for p in batch]
+        call_kwargs = dict(
+            negative_prompt=first.negative_prompt if single else [p.negative_prompt for p in batch],
+            num_inference_steps=int(first.num_inference_steps),
+            guidance_scale=float(first.guidance_scale),
             audio_start_in_s=0.0,
-            audio_end_in_s=float(seconds),
-            generator=gen,
+            audio_end_in_s=float(gen_seconds),
+            generator=make_generator(),
             # num_waveforms_per_prompt=1,  # 필요하면 추가
         )
+        negative = first.negative_prompt
+        if self._neg_embeds_ok and negative and all(p.negative_prompt == negative for p in batch):
+            # 캐시한 negative 임베딩을 batch 크기로 펼쳐서 전달(텍스트 인코더는 positive prompt만 돌림)
+            embeds, mask = self._negative_embeds(negative)
+            del call_kwargs["negative_prompt"]
+            call_kwargs["negative_prompt_embeds"] = embeds.expand(len(batch), -1, -1)
+            call_kwargs["negative_attention_mask"] = mask.expand(len(batch), -1)
+        steps = int(first.num_inference_steps)
+        cutoff = steps
+        if float(first.guidance_scale) > 1.0:
+            cutoff = min(steps, max(0, int(round(steps * float(first.guidance_cutoff_frac)))))
+
+        # diffusers pipeline 출력
+        try:
+            result = self._call_pipe(prompt, call_kwargs, cutoff, steps)
+        except Exception:
+            if self._eager is None:
+                raise
+            # 컴파일 실패(torch/diffusers 버전 등) → eager로 되돌리고 요청 길이로 다시 생성
+            logger.exception("Stable Audio torch.compile failed; using eager pipeline")
+            self._uncompile()
+            gen_seconds = max(seconds)
+            call_kwargs["audio_end_in_s"] = float(gen_seconds)
+            call_kwargs["generator"] = make_generator()
+            result = self._call_pipe(prompt, call_kwargs, cutoff, steps)
         # result = self._pipe(
         #     prompt=params.prompt,
         #     negative_prompt=params.negative_prompt,
@@ -145,23 +386,148 @@ class StableAudioOpenService:
         #     generator=gen,
         # )
 
-        # result.audios: (batch, channels, samples) 또는 (batch, samples, channels) 형태가 환경에 따라 다를 수 있어 안전 처리
-        audio = result.audios[0]
-        # torch Tensor → numpy (GPU → CPU 이동 필수)
-        if hasattr(audio, "detach"):
-            audio = audio.detach().cpu().numpy()
-        else:
-            audio = np.array(audio)
-
-        # shape 정규화: (samples, channels)
-        if audio.ndim == 2:
-            # (channels, samples)면 transpose
-            if audio.shape[0] in (1, 2) and audio.shape[1] > audio.shape[0]:
-                audio = audio.T
-        elif audio.ndim == 1:
-            audio = audio.reshape(-1, 1)
-
         # 44.1kHz로 저장(모델 스펙)
         sr = int(getattr(self._pipe.vae, "sampling_rate", 44100))
-        sf.write(str(out_wav), audio.astype(np.float32), sr)
+        out = []
+        for i, sec in enumerate(seconds):
+            # 더 긴 길이(버킷/batch 최대)로 생성한 경우 요청 길이만 남김
+            keep = int(round(sec * sr)) if gen_seconds != sec else None
+            out.append((_to_host(result.audios[i], keep), sr))
+        return out
+
+
+    def _call_pipe(self, prompt, call_kwargs: dict, cutoff: int, steps: int):
+        import torch
+
+        pipe = self._pipe
+        # 파이프라인 내부는 no_grad뿐이라 inference_mode로 한 번 더 감쌈
+        # (스텝마다 만드는 텐서에 version counter/view 추적이 붙지 않음)
+        with torch.inference_mode():
+            if cutoff >= steps:
+                return pipe(prompt, **call_kwargs)  # prompt는 positional로 넣어도 됨
+            transformer = pipe.transformer
+            # DiffusionPipeline.__setattr__는 컴포넌트 교체 시 config까지 고치므로 인스턴스 속성만 잠깐 바꿈
+            object.__setattr__(pipe, "transformer", _CfgCutoff(transformer, cutoff))
+            try:
+                return pipe(prompt, **call_kwargs)
+            finally:
+                object.__setattr__(pipe, "transformer", transformer)
+
+
+def _clamp_seconds(params: StableAudioGenParams) -> float:
+    # Stable Audio Open은 최대 길이 제한이 있음(대략 47s)
+    return max(0.2, min(float(params.seconds), 47.0))
+
+
+# 생성 대기 중인 (params, Future). SA_LOCK을 먼저 잡은 스레드가 같이 묶을 수 있는 것들을 가져감
+_PENDING: list[tuple[StableAudioGenParams, Future]] = []
+_PENDING_LOCK = Lock()
+
+
+def generate_batched(params: StableAudioGenParams) -> tuple[np.ndarray, int]:
+    """
+    공용 파이프라인(get_stable_audio)으로 생성합니다(SA_LOCK 직렬화 포함).
+    GPU가 다른 생성으로 바쁜 동안 쌓인 요청은 락을 먼저 잡은 스레드가 최대 CONFIG.sa_max_batch개까지
+    generate_many 한 번으로 같이 생성(따로 기다리는 창 없이 GPU가 비는 대로 묶음).
+    steps/guidance_scale/guidance_cutoff_frac이 같은 요청끼리만 묶입니다.
+    seed가 있는 요청은 길이까지 같은 요청들하고만 묶임(batch 최대 길이로 생성하면 길이 조건이 달라져서
+    같은 seed라도 혼자 생성한 결과와 달라지므로).
+    """
+    fut: Future = Future()
+    with _PENDING_LOCK:
+        _PENDING.append((params, fut))
+    with SA_LOCK:
+        # 앞선 스레드의 batch에 이미 포함돼서 끝났으면 결과만 가져감
+        if not fut.done():
+            key = (params.num_inference_steps, params.guidance_scale, params.guidance_cutoff_frac)
+            with _PENDING_LOCK:
+                batch = [(params, fut)]
+                seeded = params.seed is not None
+                secs = {_clamp_seconds(params)}
+                for p, f in _PENDING:
+                    if len(batch) >= CONFIG.sa_max_batch:
+                        break
+                    if f is fut or (p.num_inference_steps, p.guidance_scale, p.guidance_cutoff_frac) != key:
+                        continue
+                    sec = _clamp_seconds(p)
+                    if (seeded or p.seed is not None) and secs != {sec}:
+                        continue
+                    batch.append((p, f))
+                    seeded = seeded or p.seed is not None
+                    secs.add(sec)
+                taken = {id(f) for _, f in batch}
+                _PENDING[:] = [item for item in _PENDING if id(item[1]) not in taken]
+            service = get_stable_audio()
+            try:
+                results = service.generate_many([p for p, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    fut.set_exception(e)
+                    return fut.result()
+                # 묶어서 실패(큰 batch OOM 등) → 하나씩 다시 생성(한 요청 때문에 다 실패하지 않게)
+                logger.exception("batched Stable Audio generation failed; retrying one by one")
+                for p, f in batch:
+                    try:
+                        f.set_result(service.generate(p))
+                    except Exception as e1:
+                        f.set_exception(e1)
+            else:
+                for (_, f), res in zip(batch, results):
+                    f.set_result(res)
+    return fut.result()
+
+
+def _to_host(audio, keep: Optional[int]) -> np.ndarray:
+    """
+    파이프라인 출력 하나를 (samples, channels) float32 numpy로.
+    result.audios: (batch, channels, samples) 또는 (batch, samples, channels) 형태가 환경에 따라 다를 수 있어 안전 처리
+    """
+    if hasattr(audio, "detach"):
+        import torch
+
+        # 모양 정리/자르기는 GPU 텐서 view로 끝내고,
+        # float32 변환 + (samples, channels) 연속 배치 + GPU → CPU 복사를 copy_ 한 번으로
+        audio = _samples_channels(audio.detach())[:keep]
+        host = torch.empty(audio.shape, dtype=torch.float32, pin_memory=audio.is_cuda)
+        host.copy_(audio)
+        return host.numpy()
+    import numpy as np
+
+    return _samples_channels(np.asarray(audio, dtype=np.float32))[:keep]
+
+
+_SERVICE: Optional[StableAudioOpenService] = None
+_SERVICE_INIT_LOCK = Lock()
+# 파이프라인은 동시 호출에 안전하지 않으므로 생성(generate)은 이 락으로 직렬화
+SA_LOCK = Lock()
+
+
+def get_stable_audio() -> StableAudioOpenService:
+    """프로세스 공용 StableAudioOpenService(채팅/잡 어디서 써도 파이프라인은 하나, 모델 로드는 첫 생성 때)."""
+    global _SERVICE
+    if _SERVICE is None:
+        with _SERVICE_INIT_LOCK:
+            if _SERVICE is None:
+                _SERVICE = StableAudioOpenService()
+    return _SERVICE
+
+
+def _samples_channels(audio):
+    """
+    오디오(torch Tensor 또는 numpy)를 (samples, channels) 모양의 view로.
+    """
+    if audio.ndim == 2:
+        # (channels, samples)면 transpose
+        if audio.shape[0] in (1, 2) and audio.shape[1] > audio.shape[0]:
+            return audio.T
+    elif audio.ndim == 1:
+        return audio.reshape(-1, 1)
+    return audio
+
+
+def write_wav(out_wav: Path, audio: np.ndarray, sr: int) -> None:
+    import soundfile as sf
+
+    out_wav.parent.mkdir(parents=True, exist_ok=True)
+    sf.write(str(out_wav), audio, sr)
 
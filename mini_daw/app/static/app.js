@@ -375,6 +375,15 @@ async function applyDrumPattern(pattern, bars = 1, baseBar = 1) {
 
 // job 폴링 유틸 추가
 async function pollJob(job_id, onUpdate, intervalMs = 250) {
+  // SSE 지원 시 서버 push로 진행률 수신(실패하면 폴링으로 fallback)
+  if (typeof EventSource !== "undefined") {
+    try {
+      return await watchJob(job_id, onUpdate);
+    } catch (e) {
+      if (!e.sseUnavailable) throw e;
+    }
+  }
+
   while (true) {
     const data = await api(`/api/jobs/${job_id}`, { method: "GET" });
     onUpdate(data);
@@ -386,6 +395,34 @@ async function pollJob(job_id, onUpdate, intervalMs = 250) {
   }
 }
 
+/** /api/jobs/{id}/events(SSE) 구독 */
+function watchJob(job_id, onUpdate) {
+  return new Promise((resolve, reject) => {
+    const es = new EventSource(`/api/jobs/${job_id}/events`);
+
+    es.onmessage = (ev) => {
+      const data = JSON.parse(ev.data);
+      onUpdate(data);
+
+      if (data.status === "done") {
+        es.close();
+        resolve(data);
+      } else if (data.status === "failed") {
+        es.close();
+        reject(new Error(data.error || "job failed"));
+      }
+    };
+
+    es.onerror = () => {
+      // 완료 전에 연결이 끊기면 폴링으로 넘어감
+      es.close();
+      const err = new Error("job event stream closed");
+      err.sseUnavailable = true;
+      reject(err);
+    };
+  });
+}
+
 /** meta UI 표시(현재 index.html에서 meta-value들이 id가 없어서 최소만) */
 function renderMeta(state) {
   const projectNameEl = document.getElementById("projectName");
@@ -5,13 +5,19 @@ command_logger.py
 - rule-based 로 처리됐는지
 - LLM 기반으로 처리됐는지
 를 명확히 로그로 남기는 유틸리티
+
+print 대신 logging을 사용합니다.
+(레벨이 꺼져 있으면 문자열 포맷/출력 없이 바로 반환, 켜져 있어도 실제 출력은
+ main.py의 QueueListener 스레드가 담당 → 요청 경로에서 stdout/stderr I/O 없음)
 """
 
+import logging
 from typing import Literal, Optional
-from datetime import datetime
 
 CommandSource = Literal["RULE", "LLM", "NONE"]
 
+logger = logging.getLogger(__name__)
+
 
 def log_command_source(
     *,
@@ -21,7 +27,7 @@ def log_command_source(
     detail: Optional[str] = None,
 ):
     """
-    명령 처리 출처 로그 출력.
+    명령 처리 출처 로그 출력(INFO).
 
     source:
       - RULE : 사전 정의 명령
@@ -31,12 +37,13 @@ def log_command_source(
     detail:
       - rule type, plan summary, 실패 이유 등
     """
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    print(
-        f"[COMMAND][{ts}] "
-        f"project={project_id} "
-        f"source={source} "
-        f"message='{message}' "
-        + (f"detail={detail}" if detail else "")
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    logger.info(
+        "[COMMAND] project=%s source=%s message='%s' detail=%s",
+        project_id,
+        source,
+        message,
+        detail,
     )
@@ -0,0 +1,31 @@
+"""
+state_response.py
+
+{"state": state.to_dict(), ...} 형태의 응답을 만들 때,
+state 부분은 ProjectState.to_json_bytes()의 캐시된 바이트를 그대로 이어붙여서
+변경이 없는 state는 to_dict()/JSON 인코딩을 다시 하지 않도록 하는 유틸.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from fastapi.responses import Response
+
+from app.core.state import ProjectState
+
+
+def state_json_response(state: ProjectState, **extra: Any) -> Response:
+    """
+    {"state": <state json>, **extra} JSON 응답.
+
+    extra 값들은 orjson으로 인코딩 가능한 값이어야 합니다(dict/list/str/숫자 등).
+    """
+    body = b'{"state":' + state.to_json_bytes()
+    if extra:
+        # orjson.dumps(extra) == b'{...}' -> 앞의 '{'만 떼고 이어붙임
+        body += b"," + orjson.dumps(extra)[1:]
+    else:
+        body += b"}"
+    return Response(content=body, media_type="application/json")